@@ -1,134 +1,234 @@
 import folium
 import os
 import json
-from geopy.distance import geodesic
+import hashlib
+from branca.element import MacroElement
+from jinja2 import Template
+from recorridos import leer_coordenadas
+from escritura_atomica import escribir_atomico
+from track_store import NOMBRE_TRACK, asegurar_track
+from spatial_index import actualizar_indice_espacial
+from map_tiles import DIR_TESELAS, ZOOMS_TESELAS, TESELAS_JS, actualizar_teselas
+from trayectoria import velocidad_media
 
 HTML_MAP_PATH = "Mapa/MapaFinal.html"
 VELOCIDAD_PATH = "Velocidad/velocidades.json"
 
-def txt_a_json(txt_path, json_path):
-    """
-    Convierte un archivo .txt de coordenadas a un archivo .json con el formato {"grupos": [[lat, lon], ...]}
-    """
-    puntos = []
-    segundos = []
-    with open(txt_path, "r") as archivo:
-        for linea in archivo:
-            if "Segundo" in linea:
-                partes = linea.strip().split(":")
-                segundo = int(partes[0].replace("Segundo", "").strip())
-                coords = partes[1].split(",")
-                lat = float(coords[0].split("=")[1].strip())
-                lon = float(coords[1].split("=")[1].strip())
-                puntos.append([lat, lon])
-                segundos.append(segundo)
-    if puntos:
-        with open(json_path, "w") as f:
-            json.dump({"grupos": [puntos], "segundos": segundos}, f, indent=4)
+# Capa GeoJSON ya renderizada de cada recorrido, con un índice de firmas para invalidarlas
+CAPAS_DIR = "Mapa/capas"
+INDICE_CAPAS = "indice.json"
+# Subir al cambiar el contenido de las capas o de su índice: invalida todas las cacheadas
+VERSION_CAPAS = 2
 
-def calcular_velocidades(grupos, segundos_data):
-    velocidades = []
-    for i, grupo in enumerate(grupos):
-        if len(grupo) < 2 or i >= len(segundos_data):
-            velocidades.append(0)
-            continue
+# "capas": todo el GeoJSON dentro de MapaFinal.html. "teselas": el HTML solo lleva el código y el mapa
+# carga de Mapa/teselas las teselas visibles. Sin modo explícito se usa MODO_MAPA; a partir de
+# UMBRAL_TESELAS puntos se avisa de que "teselas" mantiene el HTML pequeño.
+MODOS_MAPA = ("capas", "teselas")
+MODO_MAPA = "capas"
+UMBRAL_TESELAS = 200_000
+# Teselas visibles a partir de las cuales el mapa deja de cargar y pide acercarse
+MAX_TESELAS_VISIBLES = 64
 
-        segundos = segundos_data[i]
-        total_dist = 0
-        total_tiempo_h = 0
+# =========================================================
+# --- CAPAS POR RECORRIDO EN CACHÉ ---
+# =========================================================
+def firma_imagenes(img_dir):
+    """Resumen (sha1) de nombre, mtime y tamaño de cada archivo de la carpeta de imágenes, o None si no existe."""
+    try:
+        entradas = sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                          for e in os.scandir(img_dir) if e.is_file())
+    except OSError:
+        return None
+    return hashlib.sha1(repr(entradas).encode()).hexdigest()
 
-        for j in range(len(grupo) - 1):
-            lat1, lon1 = grupo[j][0], grupo[j][1]
-            lat2, lon2 = grupo[j+1][0], grupo[j+1][1]
-            tiempo_seg = segundos[j+1] - segundos[j]
-            tiempo_h = tiempo_seg / 3600
-            dist_km = geodesic((lat1, lon1), (lat2, lon2)).km
-            if tiempo_h > 0:
-                total_dist += dist_km
-                total_tiempo_h += tiempo_h
+def firma_capa(recorrido, base_dir_coords="Coords", base_dir_img="Img"):
+    """Firma de las entradas de la capa: mtime del track (cordenadas.npz) y resumen de Img/recorridoX."""
+    track_path = os.path.join(base_dir_coords, recorrido, NOMBRE_TRACK)
+    try:
+        mtime_track = os.stat(track_path).st_mtime_ns
+    except OSError:
+        mtime_track = None
+    return [VERSION_CAPAS, mtime_track, firma_imagenes(os.path.join(base_dir_img, recorrido))]
 
-        vel = total_dist / total_tiempo_h if total_tiempo_h > 0 else 0
-        velocidades.append(round(vel, 2))
+def construir_capa(recorrido, grupo, segundos, base_dir_img="Img"):
+    """FeatureCollection GeoJSON del recorrido: la línea del track y un punto por cada {segundo}.webp existente."""
+    img_dir = os.path.join(base_dir_img, recorrido)
+    # Un listdir en lugar de un stat por cada segundo del track
+    imagenes = set(os.listdir(img_dir)) if os.path.isdir(img_dir) else set()
+    features = [{
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in grupo]},
+        "properties": {
+            "recorrido": recorrido,
+            "video": f"../vids/{recorrido}/video.webm",
+            "velocidad": round(velocidad_media(grupo, segundos), 2) if len(grupo) >= 2 else 0,
+        },
+    }]
+    for (lat, lon), segundo in zip(grupo, segundos):
+        if f"{segundo}.webp" in imagenes:
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"imagen": f"../Img/{recorrido}/{segundo}.webp"},
+            })
+    lats = [lat for lat, _ in grupo]
+    lons = [lon for _, lon in grupo]
+    return {"type": "FeatureCollection", "bbox": [min(lons), min(lats), max(lons), max(lats)], "features": features}
 
-    return velocidades
+def _leer_indice(capas_dir):
+    try:
+        with open(os.path.join(capas_dir, INDICE_CAPAS), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-def leer_todos_los_grupos():
-    base_dir = "Coords"
-    todos_los_grupos = []
-    segundos_grupos = []
-    nombres_recorridos = []
-    for sub in os.listdir(base_dir):
-        sub_path = os.path.join(base_dir, sub)
-        if os.path.isdir(sub_path):
-            json_file = os.path.join(sub_path, "cordenadas.json")
-            txt_file = os.path.join(sub_path, "cordenadas.txt")
-            # Si no existe el json pero sí el txt, conviértelo
-            if not os.path.exists(json_file) and os.path.exists(txt_file):
-                txt_a_json(txt_file, json_file)
-            if os.path.exists(json_file):
-                with open(json_file, "r") as f:
-                    data = json.load(f)
-                    grupos = data.get("grupos", [])
-                    segundos = data.get("segundos", [])
-                    if grupos:
-                        todos_los_grupos.append(grupos[0])
-                        segundos_grupos.append(segundos)
-                        nombres_recorridos.append(sub)
-    return todos_los_grupos, segundos_grupos, nombres_recorridos
+def leer_capas(base_dir_coords="Coords", base_dir_img="Img", capas_dir=CAPAS_DIR):
+    """Devuelve [(recorrido, geojson, entrada)] de los recorridos con puntos, rehaciendo solo las capas cuya firma cambió."""
+    os.makedirs(capas_dir, exist_ok=True)
+    indice = _leer_indice(capas_dir)
+    nuevo_indice = {}
+    capas = []
+    reconstruidas = 0
+    recorridos = os.listdir(base_dir_coords) if os.path.isdir(base_dir_coords) else []
+    for recorrido in recorridos:
+        if not os.path.isdir(os.path.join(base_dir_coords, recorrido)):
+            continue
+        # Antes de la firma: si el .txt cambió, el .npz se regenera y la capa queda invalidada
+        asegurar_track(recorrido, base_dir_coords)
+        ruta = os.path.join(capas_dir, f"{recorrido}.geojson")
+        firma = firma_capa(recorrido, base_dir_coords, base_dir_img)
+        entrada = indice.get(recorrido)
+        if entrada and entrada["firma"] == firma and os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                texto = f.read()
+        else:
+            grupo, segundos = leer_coordenadas(recorrido, base_dir_coords)
+            if not grupo:
+                continue
+            capa = construir_capa(recorrido, grupo, segundos, base_dir_img)
+            texto = json.dumps(capa, separators=(",", ":"))
+            escribir_atomico(ruta, texto)
+            entrada = {"firma": firma, "bbox": capa["bbox"], "inicio": grupo[0], "puntos": len(grupo)}
+            reconstruidas += 1
+        nuevo_indice[recorrido] = entrada
+        capas.append((recorrido, texto, entrada))
 
-def generar_mapa_desde_todas_las_subcarpetas():
-    print("Generando mapa desde todas las subcarpetas...")
-    todos_los_grupos, segundos_grupos, nombres_recorridos = leer_todos_los_grupos()
-    if not todos_los_grupos:
-        print("❌ No hay puntos registrados para generar el mapa.")
-        return
+    # Capas de recorridos que ya no existen
+    for recorrido in set(indice) - set(nuevo_indice):
+        ruta = os.path.join(capas_dir, f"{recorrido}.geojson")
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    if reconstruidas or nuevo_indice.keys() != indice.keys():
+        escribir_atomico(os.path.join(capas_dir, INDICE_CAPAS), json.dumps(nuevo_indice))
+    print(f"🗺️ Capas: {reconstruidas} renderizadas, {len(capas) - reconstruidas} desde caché")
+    return capas
 
-    velocidades = calcular_velocidades(todos_los_grupos, segundos_grupos)
+class CapaRecorrido(MacroElement):
+    """Inserta una capa GeoJSON cacheada en el mapa; la dibuja dibujarCapaRecorrido (ver CAPAS_JS)."""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        dibujarCapaRecorrido({{ this._parent.get_name() }}, {{ this.geojson }});
+        {% endmacro %}
+    """)
 
-    mapa = folium.Map(location=todos_los_grupos[0][0], zoom_start=18, tiles="OpenStreetMap")
-    total_idx = 1
+    def __init__(self, geojson):
+        super().__init__()
+        self._name = "CapaRecorrido"
+        self.geojson = geojson
 
-    for i, (grupo, segundos, nombre_recorrido) in enumerate(zip(todos_los_grupos, segundos_grupos, nombres_recorridos)):
-        coords_js = [[lat, lon] for lat, lon in grupo]
-        video_src = f"../vids/{nombre_recorrido}/video.webm"
+CAPAS_JS = """
+function abrirVideo(src) {
+    var modal = document.getElementById('videoModal');
+    var video = document.getElementById('videoPlayer');
+    video.src = src;
+    modal.style.display = 'flex';
+}
+function dibujarCapaRecorrido(mapa, capa) {
+    var icono = L.AwesomeMarkers.icon({icon: "camera", prefix: "fa", markerColor: "blue", iconColor: "white"});
+    capa.features.forEach(function (feature) {
+        var c = feature.geometry.coordinates;
+        var p = feature.properties;
+        if (feature.geometry.type === "LineString") {
+            L.polyline(c.map(function (lonlat) { return [lonlat[1], lonlat[0]]; }),
+                       {color: "blue", weight: 4, opacity: 0.8})
+                .bindPopup('<a href="#" onclick="abrirVideo(\\'' + p.video + '\\')">Ver video</a>')
+                .addTo(mapa);
+        } else {
+            // Popup solo con la imagen y opción de ampliar
+            L.marker([c[1], c[0]], {icon: icono})
+                .bindPopup("<img src='" + p.imagen + "' width='200' style='cursor:pointer;' " +
+                           "onclick=\\"ampliarImagen('" + p.imagen + "')\\">", {maxWidth: 220})
+                .addTo(mapa);
+        }
+    });
+}
+"""
+
+# =========================================================
+# --- TESELAS VECTORIALES ---
+# =========================================================
+class CapaTeselas(MacroElement):
+    """Arranca la carga de teselas (ver map_tiles.TESELAS_JS) sobre el mapa padre."""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        iniciarTeselas({{ this._parent.get_name() }}, {{ this.opciones }});
+        {% endmacro %}
+    """)
 
-        js = f"""
-        function onClickGrupo{i}() {{
-            var modal = document.getElementById('videoModal');
-            var video = document.getElementById('videoPlayer');
-            video.src = '{video_src}';
-            modal.style.display = 'flex';
-        }}
-        """
-        mapa.get_root().script.add_child(folium.Element(js))
+    def __init__(self, ruta, zooms, max_teselas):
+        super().__init__()
+        self._name = "CapaTeselas"
+        self.opciones = json.dumps({"ruta": ruta, "zooms": list(zooms), "max_teselas": max_teselas})
 
-        polyline = folium.PolyLine(grupo, color="blue", weight=4, opacity=0.8)
-        polyline.add_child(folium.Popup(f'<a href="#" onclick="onClickGrupo{i}()">Ver video</a>'))
-        polyline.add_to(mapa)
+# =========================================================
+# --- ENSAMBLADO DEL MAPA ---
+# =========================================================
+def _mapa_capas(capas):
+    mapa = folium.Map(location=capas[0][2]["inicio"], zoom_start=18, tiles="OpenStreetMap")
+    mapa.get_root().script.add_child(folium.Element(CAPAS_JS))
+    for _, geojson, _ in capas:
+        CapaRecorrido(geojson).add_to(mapa)
 
-        # Mapear solo los frames que existen en Img/recorridoX con nombre igual al segundo
-        img_dir = os.path.join("Img", nombre_recorrido)
-        for idx, (lat, lon) in enumerate(grupo):
-            if idx < len(segundos):
-                segundo = segundos[idx]
-                img_path = os.path.join(img_dir, f"{segundo}.webp")
-                if os.path.exists(img_path):
-                    # Popup solo con la imagen y opción de ampliar
-                    popup = folium.Popup(
-                        f"""
-                        <img src='../Img/{nombre_recorrido}/{segundo}.webp' width='200' style='cursor:pointer;' onclick="ampliarImagen('../Img/{nombre_recorrido}/{segundo}.webp')">
-                        """,
-                        max_width=220
-                    )
-                    folium.Marker(
-                        location=[lat, lon],
-                        icon=folium.Icon(color="blue", icon="camera", prefix="fa"),
-                        popup=popup
-                    ).add_to(mapa)
-            total_idx += 1
+    bboxes = [entrada["bbox"] for _, _, entrada in capas]
+    mapa.fit_bounds([[min(b[1] for b in bboxes), min(b[0] for b in bboxes)],
+                     [max(b[3] for b in bboxes), max(b[2] for b in bboxes)]])
+    return mapa
 
-    todos_los_puntos = [pt for grupo in todos_los_grupos for pt in grupo]
-    mapa.fit_bounds(todos_los_puntos)
+def _mapa_teselas(indice):
+    actualizar_teselas()
+    puntos = indice.puntos
+    mapa = folium.Map(location=[float(puntos["lat"][0]), float(puntos["lon"][0])], zoom_start=18, tiles="OpenStreetMap")
+    mapa.get_root().script.add_child(folium.Element(CAPAS_JS))
+    mapa.get_root().script.add_child(folium.Element(TESELAS_JS))
+    # Ruta relativa a MapaFinal.html: las teselas se cargan como file:// desde Mapa/
+    ruta = os.path.relpath(DIR_TESELAS, os.path.dirname(HTML_MAP_PATH)).replace(os.sep, "/")
+    CapaTeselas(ruta, ZOOMS_TESELAS, MAX_TESELAS_VISIBLES).add_to(mapa)
+    mapa.fit_bounds([[float(puntos["lat"].min()), float(puntos["lon"].min())],
+                     [float(puntos["lat"].max()), float(puntos["lon"].max())]])
+    return mapa
+
+def generar_mapa_desde_todas_las_subcarpetas(modo=None):
+    print("Generando mapa desde todas las subcarpetas...")
+    modo = modo or MODO_MAPA
+    if modo not in MODOS_MAPA:
+        raise ValueError(f"Modo de mapa desconocido: {modo}")
+    if modo == "teselas":
+        # Solo reindexa los recorridos importados o revisados desde la última vez
+        indice = actualizar_indice_espacial()
+        if not len(indice):
+            print("❌ No hay puntos registrados para generar el mapa.")
+            return
+        mapa = _mapa_teselas(indice)
+    else:
+        capas = leer_capas()
+        if not capas:
+            print("❌ No hay puntos registrados para generar el mapa.")
+            return
+        puntos = sum(entrada["puntos"] for _, _, entrada in capas)
+        if puntos > UMBRAL_TESELAS:
+            print(f"⚠️ {puntos} puntos: MapaFinal.html será pesado; el modo 'teselas' lo mantiene pequeño "
+                  f"(python cli.py mapa --modo-mapa teselas)")
+        mapa = _mapa_capas(capas)
 
     # Modal de video
     modal_html = """
@@ -262,14 +362,19 @@ def generar_mapa_desde_todas_las_subcarpetas():
         }
 
         let lineIndex = 0;
-        mapInstance.eachLayer(function(layer) {
-            if (layer instanceof L.Polyline && !(layer instanceof L.Polygon)) {
+        function conectarLinea(layer) {
+            // Al cambiar de zoom las teselas se quitan y se vuelven a añadir: conectar una sola vez
+            if (layer instanceof L.Polyline && !(layer instanceof L.Polygon) && !layer._conCoordenadas) {
+                layer._conCoordenadas = true;
                 const idx = lineIndex;
                 layer.on('mousemove', function(e) { mostrarDatos(idx, e); });
                 layer.on('mouseout', limpiarCoords);
                 lineIndex++;
             }
-        });
+        }
+        mapInstance.eachLayer(conectarLinea);
+        // Las líneas de las teselas llegan después de cargar la página
+        mapInstance.on('layeradd', function(e) { conectarLinea(e.layer); });
     });
     </script>
     """
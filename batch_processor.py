@@ -0,0 +1,139 @@
+# batch_processor.py
+import os
+import copy
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from recorridos import numero_recorrido, leer_coordenadas
+from frame_manifest import ManifiestoExtraccion
+from model_cache import MODEL_PATH
+
+# Modelo cargado una sola vez por proceso worker, y su versión para la caché de scores
+_modelo_worker = None
+_version_worker = None
+
+# =========================================================
+# --- BÚSQUEDA DE RECORRIDOS PENDIENTES ---
+# =========================================================
+def buscar_recorridos_pendientes(base_dir_vids="Vids", base_dir_framerep="frameRep"):
+    """Devuelve los recorridos con Vids/recorridoN/video.webm cuyo manifiesto de extracción no está completo."""
+    if not os.path.isdir(base_dir_vids):
+        return []
+    pendientes = []
+    for recorrido in os.listdir(base_dir_vids):
+        video_path = os.path.join(base_dir_vids, recorrido, "video.webm")
+        if not os.path.isfile(video_path):
+            continue
+        manifiesto = ManifiestoExtraccion.existente(os.path.join(base_dir_framerep, recorrido))
+        if manifiesto is not None and manifiesto.terminado(video_path):
+            continue
+        pendientes.append(recorrido)
+    return sorted(pendientes, key=numero_recorrido)
+
+# =========================================================
+# --- WORKERS ---
+# =========================================================
+def _inicializar_worker(model_path, hilos_torch, opciones_modelo=None, dispositivo="cpu"):
+    """Limita los hilos de torch/OpenCV del proceso y carga el modelo HyperIQA una sola vez en dispositivo."""
+    global _modelo_worker, _version_worker
+    import cv2
+    import torch
+    from model_cache import obtener_modelo_hyperiqa
+    from score_cache import version_modelo
+
+    torch.set_num_threads(hilos_torch)
+    cv2.setNumThreads(hilos_torch)
+    _modelo_worker = obtener_modelo_hyperiqa(model_path, device=torch.device(dispositivo), **(opciones_modelo or {}))
+    _version_worker = version_modelo(model_path, **(opciones_modelo or {}))
+
+def _procesar_recorrido(recorrido, base_dir_vids, base_dir_framerep, duracion_clip, batch_size, top_k, muestreo,
+                        decodificador=None, base_dir_coords="Coords"):
+    """Ejecuta flujo_completo para un recorrido dentro de un worker y devuelve su resumen de rendimiento."""
+    import cv2
+    from frame_selector import flujo_completo
+    from trayectoria import ventanas_por_segundo
+
+    video_path = os.path.join(base_dir_vids, recorrido, "video.webm")
+    framerep_dest = os.path.join(base_dir_framerep, recorrido)
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    ventanas_gps = None
+    if os.path.isdir(os.path.join(base_dir_coords, recorrido)):
+        _, segundos = leer_coordenadas(recorrido, base_dir_coords)
+        ventanas_gps = ventanas_por_segundo(segundos) if segundos else None
+
+    model_hyper, transforms, device = _modelo_worker
+    inicio = time.perf_counter()
+    flujo_completo(
+        video_path=video_path,
+        clips_dir=None,
+        frameclips_dir=None,
+        framerep_dest=framerep_dest,
+        duracion_clip=duracion_clip,
+        model_hyper=model_hyper,
+        transforms=transforms,
+        device=device,
+        batch_size=batch_size,
+        top_k=top_k,
+        muestreo=muestreo,
+        version_modelo=_version_worker,
+        ventanas_gps=ventanas_gps,
+        decodificador=decodificador
+    )
+    segundos = time.perf_counter() - inicio
+    # Del manifiesto: la carpeta puede tener .webp de una extracción anterior
+    manifiesto = ManifiestoExtraccion.existente(framerep_dest)
+    clips = manifiesto.frames_escritos if manifiesto is not None else 0
+    return {
+        "recorrido": recorrido,
+        "frames": total_frames,
+        "clips": clips,
+        "segundos": round(segundos, 2),
+        "frames_por_segundo": round(total_frames / segundos, 2) if segundos > 0 else 0.0,
+    }
+
+# =========================================================
+# --- PROCESAMIENTO EN LOTE ---
+# =========================================================
+def procesar_recorridos_en_lote(recorridos=None, num_workers=2, hilos_torch=None, duracion_clip=2, batch_size=16,
+                                top_k=None, muestreo=None, model_path=MODEL_PATH,
+                                base_dir_vids="Vids", base_dir_framerep="frameRep", opciones_modelo=None,
+                                decodificador=None, base_dir_coords="Coords", dispositivo="cpu"):
+    """Procesa varios recorridos (por defecto los pendientes) en paralelo con un pool de procesos y devuelve sus resúmenes."""
+    if recorridos is None:
+        recorridos = buscar_recorridos_pendientes(base_dir_vids, base_dir_framerep)
+    if not recorridos:
+        print("No hay recorridos pendientes por procesar.")
+        return []
+    if hilos_torch is None:
+        hilos_torch = max(1, (os.cpu_count() or 1) // num_workers)
+    if decodificador is not None and decodificador.hilos is None:
+        # Igual que torch, el decodificador de cada worker no debe usar todos los núcleos
+        decodificador = copy.copy(decodificador)
+        decodificador.hilos = hilos_torch
+
+    # Por defecto CPU: con varios workers en una sola GPU cada proceso carga su copia del modelo en VRAM
+    resumenes = []
+    contexto = multiprocessing.get_context("spawn")  # fork + torch puede bloquearse
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=contexto,
+                             initializer=_inicializar_worker, initargs=(model_path, hilos_torch, opciones_modelo, dispositivo)) as pool:
+        futuros = {
+            pool.submit(_procesar_recorrido, recorrido, base_dir_vids, base_dir_framerep,
+                        duracion_clip, batch_size, top_k, muestreo, decodificador, base_dir_coords): recorrido
+            for recorrido in recorridos
+        }
+        for futuro in as_completed(futuros):
+            recorrido = futuros[futuro]
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                resumen = {"recorrido": recorrido, "error": str(e)}
+                print(f"❌ {recorrido}: {e}")
+            else:
+                print(f"✅ {recorrido}: {resumen['clips']} clips, {resumen['frames_por_segundo']} frames/s")
+            resumenes.append(resumen)
+    return resumenes
+
+if __name__ == "__main__":
+    procesar_recorridos_en_lote()
@@ -0,0 +1,324 @@
+# cli.py
+"""Punto de entrada sin interfaz gráfica: importar recorridos, extraer frames y regenerar el mapa."""
+import os
+import sys
+import argparse
+from recorridos import importar_recorrido, ultimo_recorrido, copiar_frames_a_img, leer_coordenadas
+from model_cache import MODEL_PATH
+
+# =========================================================
+# --- COMANDOS ---
+# =========================================================
+def parsear_muestreo(texto):
+    """Convierte 'modo:valor' (p. ej. 'cada:3', 'fps:5', 'adaptativo:8') en la tupla de muestreo."""
+    if not texto:
+        return None
+    modo, _, valor = texto.partition(":")
+    if modo not in ("cada", "fps", "adaptativo") or not valor:
+        raise argparse.ArgumentTypeError(f"Muestreo inválido: {texto} (usa cada:N, fps:F o adaptativo:U)")
+    return modo, float(valor)
+
+def opciones_modelo(args):
+    """Opciones de load_hyperiqa_model activadas por línea de comandos (solo las no por defecto, para la caché)."""
+    opciones = {nombre: True for nombre in ("optimizado", "cuantizado") if getattr(args, nombre, False)}
+    recortes, _, n = getattr(args, "recortes", "centro").partition(":")
+    if recortes != "centro":
+        opciones["recortes"] = recortes
+        opciones["n_recortes"] = int(n) if n else 1
+    return opciones
+
+def decodificador(args):
+    """Decodificador elegido por línea de comandos, o None para el cv2.VideoCapture por defecto."""
+    if args.decodificador == "opencv" and not args.ancho_decodificacion:
+        return None
+    from video_backends import Decodificador
+    return Decodificador(args.decodificador, hilos=args.hilos_decodificacion, ancho_max=args.ancho_decodificacion,
+                         aceleracion=args.aceleracion_hw)
+
+def parsear_pesos(texto):
+    """Convierte 'nitidez=0.1,hyperiqa=0.6' en un diccionario de pesos para el motor de puntuación."""
+    pesos = {}
+    for parte in texto.split(","):
+        nombre, _, valor = parte.partition("=")
+        if nombre.strip() not in ("nitidez", "contraste", "entropia", "hyperiqa") or not valor:
+            raise argparse.ArgumentTypeError(f"Peso inválido: {parte}")
+        pesos[nombre.strip()] = float(valor)
+    return pesos
+
+def comando_importar(args):
+    recorrido = importar_recorrido(args.video, args.coords)
+    print(f"✅ Recorrido importado en {recorrido}.")
+    return recorrido
+
+def comando_frames(args, recorrido=None):
+    # Import diferido: torch solo se carga cuando realmente se extraen frames
+    from frame_selector import flujo_completo
+    from model_cache import obtener_modelo_hyperiqa
+    from score_cache import version_modelo
+
+    recorrido = recorrido or args.recorrido or ultimo_recorrido()
+    if not recorrido:
+        raise SystemExit("❌ No hay recorridos para extraer frames.")
+    video_path = os.path.join("Vids", recorrido, "video.webm")
+    if not os.path.exists(video_path):
+        raise SystemExit(f"❌ No se encontró el video: {video_path}")
+    framerep_dest = os.path.join("frameRep", recorrido)
+    ventanas_gps = None
+    # Con coordenadas los frames se nombran {segundo}.webp, como los busca el mapa
+    if args.gps or args.metros or os.path.isdir(os.path.join("Coords", recorrido)):
+        from trayectoria import ventanas_por_segundo, ventanas_por_distancia
+        puntos, segundos = leer_coordenadas(recorrido)
+        if not segundos:
+            if args.gps or args.metros:
+                raise SystemExit(f"❌ No hay coordenadas para sincronizar {recorrido}.")
+            print(f"⚠️ {recorrido} no tiene coordenadas: un frame por clip")
+        elif args.metros:
+            ventanas_gps = ventanas_por_distancia(puntos, segundos, args.metros, args.velocidad_minima)
+        else:
+            ventanas_gps = ventanas_por_segundo(segundos, args.ventana_gps)
+
+    model_hyper, transforms, device = obtener_modelo_hyperiqa(args.modelo, **opciones_modelo(args))
+    version = version_modelo(args.modelo, **opciones_modelo(args))
+
+    def progress_callback(val, total, etapa="inferencia"):
+        if etapa == "inferencia":
+            print(f"\rExtrayendo frames ({val}/{total})...", end="", flush=True)
+
+    flujo_completo(
+        video_path=video_path,
+        clips_dir=os.path.join("Clips", recorrido),
+        frameclips_dir=os.path.join("frameclips", recorrido),
+        framerep_dest=framerep_dest,
+        duracion_clip=args.duracion_clip,
+        model_hyper=model_hyper,
+        transforms=transforms,
+        device=device,
+        progress_callback=progress_callback,
+        guardar_intermedios=args.guardar_intermedios,
+        batch_size=args.batch_size,
+        top_k=args.top_k,
+        muestreo=args.muestreo,
+        paralelo=args.paralelo,
+        pesos=args.pesos,
+        normalizacion=args.normalizacion,
+        salida_temprana=args.salida_temprana,
+        calidad_webp=args.calidad_webp,
+        reanudar=not args.reiniciar,
+        version_modelo=version,
+        usar_cache=not args.sin_cache,
+        ventanas_gps=ventanas_gps,
+        decodificador=decodificador(args)
+    )
+    print()
+    if args.copiar_img:
+        copiar_frames_a_img(framerep_dest, os.path.join("Img", recorrido))
+    print(f"✅ Frames guardados en {framerep_dest}")
+
+def comando_mapa(args):
+    from Map_generator import generar_mapa_desde_todas_las_subcarpetas
+    generar_mapa_desde_todas_las_subcarpetas(modo=getattr(args, "modo_mapa", None))
+
+def comando_optimizar(args):
+    from model_export import verificar_paridad
+    ok, diferencia = verificar_paridad(args.modelo)
+    print(f"{'✅' if ok else '❌'} Paridad eager vs optimizado: diferencia máxima {diferencia:.6f}")
+    if not ok:
+        raise SystemExit(1)
+
+def comando_cuantizar(args):
+    from quantization import reporte_cuantizacion
+    for clave, valor in reporte_cuantizacion(args.modelo, n_frames=args.frames).items():
+        print(f"{clave}: {valor}")
+
+def comando_todo(args):
+    # Sin copiar a Img/ el mapa se generaría sin frames
+    args.copiar_img = not args.sin_copiar_img
+    recorrido = comando_importar(args)
+    comando_frames(args, recorrido=recorrido)
+    comando_mapa(args)
+
+def comando_lote(args):
+    from batch_processor import procesar_recorridos_en_lote
+    procesar_recorridos_en_lote(
+        num_workers=args.workers,
+        hilos_torch=args.hilos_torch,
+        duracion_clip=args.duracion_clip,
+        batch_size=args.batch_size,
+        top_k=args.top_k,
+        muestreo=args.muestreo,
+        model_path=args.modelo,
+        opciones_modelo=opciones_modelo(args),
+        decodificador=decodificador(args),
+        dispositivo=args.dispositivo
+    )
+
+def comando_decodificacion(args):
+    from video_backends import reporte_decodificacion
+    recorrido = args.recorrido or ultimo_recorrido()
+    video_path = os.path.join("Vids", recorrido, "video.webm")
+    if not recorrido or not os.path.exists(video_path):
+        raise SystemExit(f"❌ No se encontró el video: {video_path}")
+    for nombre, fps in reporte_decodificacion(video_path, max_frames=args.frames, hilos=args.hilos,
+                                              ancho_max=args.ancho).items():
+        print(f"{nombre}: {fps} frames/s")
+
+def comando_convertir_coords(args):
+    from track_store import convertir_coords
+    for recorrido, puntos in convertir_coords(borrar_json=args.borrar_json).items():
+        print(f"✅ {recorrido}: {puntos} puntos")
+
+def comando_buscar(args):
+    from spatial_index import actualizar_indice_espacial
+    indice = actualizar_indice_espacial()
+    if args.bbox:
+        puntos = indice.buscar_bbox(*args.bbox, solo_fotos=args.solo_fotos)
+        print(f"{len(puntos)} puntos en el rectángulo")
+        for recorrido_id in sorted(set(puntos["recorrido"].tolist())):
+            print(f"  {indice.nombre(recorrido_id)}")
+        return
+    if args.lat is None or args.lon is None:
+        raise SystemExit("❌ Indica --lat y --lon, o --bbox")
+    cercanos = indice.recorridos_cercanos(args.lat, args.lon, args.metros)
+    if not cercanos:
+        print(f"Ningún recorrido a menos de {args.metros} m")
+    for recorrido, segundos in cercanos.items():
+        print(f"{recorrido}: {len(segundos)} frames ({', '.join(f'{s}.webp' for s in segundos[:10])})")
+
+def comando_indice(args):
+    from spatial_index import reporte_indice
+    for clave, valor in reporte_indice(n_puntos=args.puntos).items():
+        print(f"{clave}: {valor}")
+
+def comando_velocidades(args):
+    from trayectoria import reporte_velocidades
+    for nombre, medida in reporte_velocidades(n_puntos=args.puntos).items():
+        print(f"{nombre}: {medida}")
+
+# =========================================================
+# --- ARGUMENTOS ---
+# =========================================================
+def _agregar_opciones_frames(parser, opciones_recorrido=True):
+    parser.add_argument("--modelo", default=MODEL_PATH, help="Ruta al modelo HyperIQA preentrenado")
+    parser.add_argument("--duracion-clip", type=int, default=2, help="Duración de cada ventana en segundos")
+    parser.add_argument("--batch-size", type=int, default=16, help="Frames por lote de inferencia HyperIQA")
+    parser.add_argument("--top-k", type=int, default=None, help="Ejecutar HyperIQA solo en los K mejores frames")
+    parser.add_argument("--muestreo", type=parsear_muestreo, default=None, help="cada:N | fps:F | adaptativo:U")
+    parser.add_argument("--optimizado", action="store_true",
+                        help="Usar el modelo de inferencia optimizado (BatchNorm plegado, channels_last, TorchScript)")
+    parser.add_argument("--cuantizado", action="store_true", help="Usar la variante INT8 para CPU")
+    parser.add_argument("--recortes", default="centro", help="centro | aleatorio:N | mosaico")
+    parser.add_argument("--decodificador", choices=("opencv", "opencv-hilos", "pyav"), default="opencv",
+                        help="Backend de decodificación de video (pyav requiere pip install av)")
+    parser.add_argument("--hilos-decodificacion", type=int, default=None,
+                        help="Hilos del decodificador (por defecto todos los núcleos)")
+    parser.add_argument("--ancho-decodificacion", type=int, default=None,
+                        help="Puntuar frames reducidos a este ancho; el ganador se guarda a resolución completa")
+    parser.add_argument("--aceleracion-hw", action="store_true",
+                        help="Pedir decodificación por hardware a OpenCV (con --decodificador opencv-hilos)")
+    if opciones_recorrido:
+        parser.add_argument("--paralelo", action="store_true", help="Solapar decodificación, métricas e inferencia")
+        parser.add_argument("--pesos", type=parsear_pesos, default=None,
+                            help="Pesos de la puntuación, p. ej. nitidez=0.1,contraste=0.1,entropia=0.1,hyperiqa=0.7")
+        parser.add_argument("--normalizacion", choices=("ninguna", "zscore", "rango"), default="ninguna",
+                            help="Normalización acumulada por recorrido de cada métrica")
+        parser.add_argument("--salida-temprana", action="store_true",
+                            help="Omitir HyperIQA en frames que ya no pueden superar al mejor de su ventana")
+        parser.add_argument("--calidad-webp", type=int, default=None,
+                            help="Calidad WebP 1-100 de los frames representativos (por defecto sin pérdida)")
+        parser.add_argument("--reiniciar", action="store_true",
+                            help="Ignorar el manifiesto del recorrido y procesar todas las ventanas de nuevo")
+        parser.add_argument("--gps", action="store_true",
+                            help="Exigir coordenadas: un frame por segundo con coordenada, nombrado {segundo}.webp "
+                                 "como espera el mapa (es lo predeterminado si existe Coords/recorridoN)")
+        parser.add_argument("--ventana-gps", type=float, default=1.0,
+                            help="Segundos de video alrededor de cada coordenada entre los que se elige el frame")
+        parser.add_argument("--metros", type=float, default=None,
+                            help="Un frame cada N metros recorridos según el GPS, omitiendo los tramos detenidos")
+        parser.add_argument("--velocidad-minima", type=float, default=0.5,
+                            help="Velocidad (m/s) por debajo de la cual --metros considera el vehículo detenido")
+        parser.add_argument("--sin-cache", action="store_true",
+                            help="No leer ni guardar métricas y scores por frame en Scores/")
+        parser.add_argument("--guardar-intermedios", action="store_true", help="Guardar Clips/ y frameclips/")
+        parser.add_argument("--copiar-img", action="store_true",
+                            help="Copiar los frames a Img/ sin revisión manual (para que aparezcan en el mapa)")
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="PotholeMapper sin interfaz gráfica")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_importar = sub.add_parser("importar", help="Importar un video y su archivo de coordenadas")
+    p_importar.add_argument("video")
+    p_importar.add_argument("coords")
+    p_importar.set_defaults(func=comando_importar)
+
+    p_frames = sub.add_parser("frames", help="Extraer el mejor frame por clip de un recorrido")
+    p_frames.add_argument("--recorrido", default=None, help="Nombre del recorrido (por defecto el último)")
+    _agregar_opciones_frames(p_frames)
+    p_frames.set_defaults(func=comando_frames)
+
+    p_mapa = sub.add_parser("mapa", help="Regenerar Mapa/MapaFinal.html")
+    p_mapa.add_argument("--modo-mapa", choices=("capas", "teselas"), default=None,
+                        help="capas: todo en MapaFinal.html; teselas: teselas vectoriales en Mapa/teselas "
+                             "(por defecto Map_generator.MODO_MAPA, capas)")
+    p_mapa.set_defaults(func=comando_mapa)
+
+    p_optimizar = sub.add_parser("optimizar", help="Exportar el modelo optimizado y verificar su paridad")
+    p_optimizar.add_argument("--modelo", default=MODEL_PATH, help="Ruta al modelo HyperIQA preentrenado")
+    p_optimizar.set_defaults(func=comando_optimizar)
+
+    p_cuantizar = sub.add_parser("cuantizar", help="Calibrar el modelo INT8 y compararlo con FP32")
+    p_cuantizar.add_argument("--modelo", default=MODEL_PATH, help="Ruta al modelo HyperIQA preentrenado")
+    p_cuantizar.add_argument("--frames", type=int, default=64, help="Frames de evaluación")
+    p_cuantizar.set_defaults(func=comando_cuantizar)
+
+    p_decodificacion = sub.add_parser("decodificacion", help="Medir frames/s de cada backend de decodificación")
+    p_decodificacion.add_argument("--recorrido", default=None, help="Nombre del recorrido (por defecto el último)")
+    p_decodificacion.add_argument("--frames", type=int, default=600, help="Frames a decodificar por backend")
+    p_decodificacion.add_argument("--hilos", type=int, default=None, help="Hilos del decodificador")
+    p_decodificacion.add_argument("--ancho", type=int, default=512, help="Ancho de la variante reducida")
+    p_decodificacion.set_defaults(func=comando_decodificacion)
+
+    p_convertir = sub.add_parser("convertir-coords", help="Convertir las coordenadas de Coords/ a cordenadas.npz")
+    p_convertir.add_argument("--borrar-json", action="store_true", help="Eliminar los cordenadas.json ya convertidos")
+    p_convertir.set_defaults(func=comando_convertir_coords)
+
+    p_buscar = sub.add_parser("buscar", help="Recorridos y frames cerca de un punto o dentro de un rectángulo")
+    p_buscar.add_argument("--lat", type=float, default=None, help="Latitud del punto")
+    p_buscar.add_argument("--lon", type=float, default=None, help="Longitud del punto")
+    p_buscar.add_argument("--metros", type=float, default=50.0, help="Radio de búsqueda en metros")
+    p_buscar.add_argument("--bbox", type=float, nargs=4, default=None, metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"),
+                          help="Rectángulo de búsqueda en lugar de un radio")
+    p_buscar.add_argument("--solo-fotos", action="store_true", help="Con --bbox, solo puntos con frame")
+    p_buscar.set_defaults(func=comando_buscar)
+
+    p_indice = sub.add_parser("indice", help="Medir el índice espacial sobre un conjunto sintético")
+    p_indice.add_argument("--puntos", type=int, default=1_000_000, help="Puntos del conjunto sintético")
+    p_indice.set_defaults(func=comando_indice)
+
+    p_velocidades = sub.add_parser("velocidades", help="Comparar el cálculo de velocidades vectorizado con geopy")
+    p_velocidades.add_argument("--puntos", type=int, default=20000, help="Puntos del track sintético")
+    p_velocidades.set_defaults(func=comando_velocidades)
+
+    p_todo = sub.add_parser("todo", help="Importar, extraer frames, copiarlos a Img/ y regenerar el mapa")
+    p_todo.add_argument("video")
+    p_todo.add_argument("coords")
+    _agregar_opciones_frames(p_todo)
+    p_todo.add_argument("--sin-copiar-img", action="store_true",
+                        help="Dejar los frames en frameRep/ para revisarlos antes de que lleguen al mapa")
+    p_todo.set_defaults(func=comando_todo)
+
+    p_lote = sub.add_parser("lote", help="Procesar en paralelo todos los recorridos pendientes")
+    p_lote.add_argument("--workers", type=int, default=2, help="Procesos en paralelo")
+    p_lote.add_argument("--hilos-torch", type=int, default=None, help="Hilos de torch por proceso")
+    p_lote.add_argument("--dispositivo", default="cpu", help="Dispositivo de torch de cada worker (cpu, cuda, cuda:1...)")
+    _agregar_opciones_frames(p_lote, opciones_recorrido=False)
+    p_lote.set_defaults(func=comando_lote)
+
+    return parser
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
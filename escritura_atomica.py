@@ -0,0 +1,26 @@
+# escritura_atomica.py
+import os
+import contextlib
+
+# =========================================================
+# --- REEMPLAZO ATÓMICO DE ARCHIVOS ---
+# =========================================================
+@contextlib.contextmanager
+def reemplazo_atomico(ruta):
+    """Entrega una ruta temporal junto a ruta y, si el bloque termina sin error, la mueve sobre ruta con os.replace."""
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    # Conserva la extensión (x.tmp.npy) para que np.save/np.savez no añadan la suya
+    temporal = f"{ruta}.tmp{os.path.splitext(ruta)[1]}"
+    try:
+        yield temporal
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+def escribir_atomico(ruta, texto):
+    """Escribe texto UTF-8 en ruta sin dejar nunca un archivo a medio escribir."""
+    with reemplazo_atomico(ruta) as temporal:
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(texto)
@@ -0,0 +1,130 @@
+# frame_manifest.py
+import os
+import json
+import time
+import shutil
+from escritura_atomica import escribir_atomico
+
+# Archivo oculto en frameRep/recorridoX: copiar_frames_a_img y la revisión solo listan .webp
+NOMBRE_MANIFIESTO = ".manifiesto.json"
+# 2: estado de NormalizadorRango como histograma acotado
+VERSION_MANIFIESTO = 2
+# Subcarpeta a la que se apartan los .webp de un manifiesto descartado
+DIR_ANTERIORES = ".anteriores"
+
+# =========================================================
+# --- MANIFIESTO DE EXTRACCIÓN REANUDABLE ---
+# =========================================================
+def firma_video(video_path):
+    """Identifica el video por tamaño y fecha de modificación (sin leerlo completo)."""
+    st = os.stat(video_path)
+    return [st.st_size, st.st_mtime_ns]
+
+class ManifiestoExtraccion:
+    """Registra en framerep_dest/.manifiesto.json qué ventanas de clip ya están puntuadas, con su mejor frame y su score."""
+    def __init__(self, framerep_dest, video_path, parametros, intervalo=10.0, reiniciar=False):
+        self._inicializar(framerep_dest, intervalo)
+        base = {
+            "version": VERSION_MANIFIESTO,
+            "video": firma_video(video_path),
+            # Ida y vuelta por JSON para comparar tuplas y listas por igual
+            "parametros": json.loads(json.dumps(parametros)),
+        }
+        datos = self._leer()
+        if datos and not reiniciar and all(datos.get(clave) == valor for clave, valor in base.items()):
+            self.datos = datos
+        else:
+            if datos:
+                self._apartar_frames(datos)
+            self.datos = dict(base, clips={}, completo=False, motor=None)
+
+    def _inicializar(self, framerep_dest, intervalo):
+        self.framerep_dest = framerep_dest
+        self.ruta = os.path.join(framerep_dest, NOMBRE_MANIFIESTO)
+        self.intervalo = intervalo
+        self.ultimo_guardado = 0.0
+
+    @classmethod
+    def existente(cls, framerep_dest):
+        """El manifiesto guardado en framerep_dest tal cual (sin comparar parámetros), o None si no hay."""
+        manifiesto = cls.__new__(cls)
+        manifiesto._inicializar(framerep_dest, intervalo=10.0)
+        manifiesto.datos = manifiesto._leer()
+        return manifiesto if manifiesto.datos else None
+
+    def terminado(self, video_path):
+        """True si el manifiesto es de este video y todas sus ventanas están escritas."""
+        return self.datos.get("video") == firma_video(video_path) and self.completo
+
+    def _apartar_frames(self, datos):
+        """Mueve a .anteriores/ los .webp del manifiesto descartado: con otras ventanas sus nombres ya no corresponden."""
+        destino = os.path.join(self.framerep_dest, DIR_ANTERIORES)
+        shutil.rmtree(destino, ignore_errors=True)
+        for clip_idx, entrada in datos.get("clips", {}).items():
+            origen = os.path.join(self.framerep_dest, f"{clip_idx}.webp")
+            if entrada.get("frame") is not None and os.path.exists(origen):
+                os.makedirs(destino, exist_ok=True)
+                os.replace(origen, os.path.join(destino, f"{clip_idx}.webp"))
+
+    def _leer(self):
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def hecho(self, clip_idx):
+        entrada = self.datos["clips"].get(str(clip_idx))
+        if entrada is None:
+            return False
+        # Una vez finalizado, la revisión puede borrar .webp: la ventana sigue hecha
+        if self.completo or entrada["frame"] is None:
+            return True
+        return os.path.exists(os.path.join(self.framerep_dest, f"{clip_idx}.webp"))
+
+    @property
+    def completo(self):
+        return bool(self.datos.get("completo"))
+
+    @property
+    def total_clips(self):
+        return len(self.datos["clips"])
+
+    @property
+    def frames_escritos(self):
+        return sum(1 for entrada in self.datos["clips"].values() if entrada["frame"] is not None)
+
+    @property
+    def estado_motor(self):
+        return self.datos["motor"]
+
+    def primer_pendiente(self):
+        """Índice (desde 1) de la primera ventana sin terminar."""
+        clip_idx = 1
+        while self.hecho(clip_idx):
+            clip_idx += 1
+        return clip_idx
+
+    def registrar(self, clip_idx, frame_idx, score, motor=None):
+        """Anota el resultado de una ventana (frame_idx None si no tuvo candidatos)."""
+        self.datos["clips"][str(clip_idx)] = {
+            "frame": None if frame_idx is None else int(frame_idx),
+            "score": None if score is None else float(score),
+        }
+        if motor is not None:
+            self.datos["motor"] = motor.estado()
+        self.guardar()
+
+    def finalizar(self, motor=None):
+        self.datos["completo"] = True
+        if motor is not None:
+            self.datos["motor"] = motor.estado()
+        self.guardar(forzar=True)
+
+    def guardar(self, forzar=False):
+        ahora = time.monotonic()
+        if not forzar and ahora - self.ultimo_guardado < self.intervalo:
+            return
+        # Un corte a mitad de escritura no deja un manifiesto corrupto
+        escribir_atomico(self.ruta, json.dumps(self.datos))
+        self.ultimo_guardado = ahora
@@ -0,0 +1,165 @@
+# frame_pipeline.py
+import os
+import math
+import queue
+import threading
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from quality_metrics import apilar_grises, calcular_metricas_lote
+from scoring import MotorPuntuacion
+from frame_writer import EscritorWebp
+from frame_selector import (
+    abrir_video, posicionar_video, leer_frames, ventanas_de_clip, volcar_depuracion,
+    seleccionar_de_candidatos, LectorResolucionCompleta, tramos_en_frames, leer_tramos
+)
+
+# Marcador de fin de flujo entre etapas
+_FIN = object()
+
+# =========================================================
+# --- PIPELINE PARALELO DECODIFICACIÓN / MÉTRICAS / INFERENCIA ---
+# =========================================================
+def _reportar(progress_callback, valor, total, etapa):
+    """Envía el progreso de una etapa a través del progress_callback existente."""
+    if progress_callback:
+        progress_callback(valor, total, etapa)
+
+def _metricas_de_lote(frames):
+    """Métricas (nitidez, contraste, entropía) de un lote de frames con las funciones vectorizadas de quality_metrics."""
+    return np.stack(calcular_metricas_lote(apilar_grises(frames)), axis=1)
+
+def _ventanas_gps(cap, ventanas, fps, muestreo=None, manifiesto=None):
+    """Genera (segundo, ventana) de las ventanas GPS pendientes, decodificando solo sus tramos (ver leer_tramos)."""
+    posicion = 0
+    for segundo, rangos in ventanas:
+        if manifiesto is not None and manifiesto.hecho(segundo):
+            continue
+        yield segundo, leer_tramos(cap, rangos, fps, muestreo=muestreo, posicion=posicion)
+        posicion = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+def _etapa_decodificacion(video_path, frames_por_clip, fps, total_frames, pool, cola, detener,
+                          muestreo, clips_dir, frameclips_dir, progress_callback, manifiesto=None, cache=None,
+                          decodificador=None, batch_size=16, ventanas_gps=None):
+    """Hilo productor: decodifica el video y encola (clave, [(indice, frame)], futuro de métricas) por lote."""
+    cap = None
+    try:
+        cap, _, _ = abrir_video(video_path, decodificador)
+        if ventanas_gps is not None:
+            ventanas = _ventanas_gps(cap, ventanas_gps, fps, muestreo=muestreo, manifiesto=manifiesto)
+        else:
+            inicio = 0
+            if manifiesto is not None:
+                inicio = posicionar_video(cap, (manifiesto.primer_pendiente() - 1) * frames_por_clip)
+            frames = leer_frames(cap, muestreo=muestreo, fps=fps, inicio=inicio)
+            ventanas = ventanas_de_clip(frames, frames_por_clip)
+        for clip_idx, ventana in ventanas:
+            if manifiesto is not None and manifiesto.hecho(clip_idx):
+                for _ in ventana:
+                    pass
+                continue
+            if clips_dir or frameclips_dir:
+                ventana = volcar_depuracion(ventana, clip_idx, fps, clips_dir, frameclips_dir)
+            ventana = iter(ventana)
+            while True:
+                lote = list(itertools.islice(ventana, batch_size))
+                if not lote:
+                    break
+                futuro = pool.submit(_metricas_de_lote, [frame for _, frame in lote])
+                if not _encolar(cola, (clip_idx, lote, futuro), detener):
+                    return
+                _reportar(progress_callback, lote[-1][0] + 1, total_frames, "decodificacion")
+        _reportar(progress_callback, total_frames, total_frames, "decodificacion")
+        if cache is not None and ventanas_gps is None:
+            # Con ventanas GPS solo se leyeron sus tramos: el video no quedó cubierto entero
+            cache.registrar_fin(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        _encolar(cola, _FIN, detener)
+    except Exception as e:
+        _encolar(cola, e, detener)
+    finally:
+        if cap is not None:
+            cap.release()
+
+def _encolar(cola, item, detener):
+    """Encola respetando la capacidad (contrapresión) y abandona si el consumidor se detuvo."""
+    while not detener.is_set():
+        try:
+            cola.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _consumir_metricas(cola, total_frames, progress_callback, cache=None):
+    """Etapa de métricas: entrega (clip, (indice, frame, metricas)) en orden a medida que los workers terminan."""
+    while True:
+        item = cola.get()
+        if item is _FIN:
+            return
+        if isinstance(item, Exception):
+            raise item
+        clip_idx, lote, futuro = item
+        metricas = futuro.result()
+        if cache is not None:
+            cache.guardar_metricas([frame_idx for frame_idx, _ in lote], metricas)
+        _reportar(progress_callback, lote[-1][0] + 1, total_frames, "metricas")
+        for (frame_idx, frame), fila in zip(lote, metricas):
+            yield clip_idx, (frame_idx, frame, tuple(fila))
+
+def procesar_video_en_paralelo(video_path, framerep_dest, duracion_clip, model_hyper, transforms, device,
+                               progress_callback=None, clips_dir=None, frameclips_dir=None, batch_size=16,
+                               top_k=None, muestreo=None, num_workers=None, capacidad_cola=64, motor=None,
+                               escritor=None, manifiesto=None, cache=None, decodificador=None, ventanas_gps=None):
+    """Selecciona el mejor frame por clip (o por ventana GPS) con decodificación, métricas, inferencia y escritura solapadas."""
+    motor = motor or MotorPuntuacion()
+    os.makedirs(framerep_dest, exist_ok=True)
+    for debug_dir in (clips_dir, frameclips_dir):
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+
+    cap, fps, total_frames = abrir_video(video_path, decodificador)
+    cap.release()
+    lector = LectorResolucionCompleta(video_path, decodificador)
+    frames_por_clip = max(1, duracion_clip * fps)
+    total_clips = math.ceil(total_frames / frames_por_clip) if total_frames > 0 else 0
+    if ventanas_gps is not None:
+        ventanas_gps = [(segundo, tramos_en_frames(tramos, fps)) for segundo, tramos in ventanas_gps]
+        if total_frames > 0:
+            ventanas_gps = [(segundo, rangos) for segundo, rangos in ventanas_gps if rangos[0][0] < total_frames]
+        total_clips = len(ventanas_gps)
+    if num_workers is None:
+        num_workers = max(1, (os.cpu_count() or 2) - 1)
+
+    cola = queue.Queue(maxsize=max(1, capacidad_cola // batch_size))
+    detener = threading.Event()
+    with ThreadPoolExecutor(max_workers=num_workers) as pool, \
+            EscritorWebp() if escritor is None else contextlib.nullcontext(escritor) as escritor:
+        productor = threading.Thread(
+            target=_etapa_decodificacion,
+            args=(video_path, frames_por_clip, fps, total_frames, pool, cola, detener,
+                  muestreo, clips_dir, frameclips_dir, progress_callback, manifiesto, cache, decodificador,
+                  batch_size, ventanas_gps),
+            daemon=True
+        )
+        productor.start()
+        try:
+            flujo = _consumir_metricas(cola, total_frames, progress_callback, cache)
+            for n, (clip_idx, grupo) in enumerate(itertools.groupby(flujo, key=lambda item: item[0]), start=1):
+                candidatos = (candidato for _, candidato in grupo)
+                mejor = seleccionar_de_candidatos(candidatos, model_hyper, transforms, device,
+                                                  batch_size=batch_size, top_k=top_k, motor=motor, cache=cache)
+                if mejor is not None:
+                    out_path = os.path.join(framerep_dest, f"{clip_idx}.webp")  # SOLO el número del clip o el segundo
+                    escritor.escribir(out_path, lector.frame(mejor[0], mejor[1]))
+                if manifiesto is not None:
+                    manifiesto.registrar(clip_idx, mejor and mejor[0], mejor and mejor[2], motor=motor)
+                valor = n if ventanas_gps is not None else clip_idx
+                _reportar(progress_callback, valor, max(total_clips, valor), "inferencia")
+        finally:
+            detener.set()
+            productor.join()
+            lector.cerrar()
+    if manifiesto is not None:
+        manifiesto.finalizar(motor)
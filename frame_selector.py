@@ -1,6 +1,10 @@
 
 # frame_selector.py
 import os
+import math
+import contextlib
+import heapq
+import itertools
 import cv2
 import torch
 import torchvision
@@ -8,27 +12,116 @@ import numpy as np
 from PIL import Image
 from skimage.measure import shannon_entropy
 import models
+from model_cache import MODEL_PATH
+from quality_metrics import apilar_grises, calcular_metricas_lote
+from scoring import MotorPuntuacion
+from frame_writer import EscritorWebp
+from frame_manifest import ManifiestoExtraccion
+from score_cache import CacheScores, ScoresIncompletos
+from video_backends import Decodificador
 
 # =========================================================
 # --- CONFIGURACIÓN DE MODELO Y TRANSFORMACIONES ---
 # =========================================================
-def load_hyperiqa_model(model_path='./pretrained/koniq_pretrained.pkl', device=None):
-    """Carga el modelo HyperIQA preentrenado."""
-    if device is None:
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-    model_hyper = models.HyperNet(16, 112, 224, 112, 56, 28, 14, 7)
+def construir_hypernet(model_path, device):
+    """Construye HyperNet en modo evaluación con los pesos del checkpoint HyperIQA."""
+    # El checkpoint sobrescribe todos los pesos: no hace falta cargar ResNet-50 de ImageNet antes
+    model_hyper = models.HyperNet(16, 112, 224, 112, 56, 28, 14, 7, pretrained_backbone=False)
     model_hyper.load_state_dict(torch.load(model_path, map_location=device))
     model_hyper.to(device)
     model_hyper.eval()
+    return model_hyper
+
+class RecortesHyperIQA:
+    """Preprocesa una imagen PIL en K recortes normalizados de 224x224: devuelve un tensor (K, 3, 224, 224)."""
+    def __init__(self, estrategia="centro", n_recortes=1, tamano=224, redimension=(512, 384), preprocesado="cv2"):
+        self.estrategia = estrategia
+        self.tamano = tamano
+        self.redimension = redimension
+        self.preprocesado = preprocesado
+        media = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+        desviacion = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+        # (x / 255 - media) / desviacion == x * escala + desplazamiento, por canal RGB
+        self._escala = (1.0 / (255.0 * desviacion)).reshape(3, 1, 1)
+        self._desplazamiento = (-media / desviacion).reshape(3, 1, 1)
+        self._redimensionado = np.empty((redimension[0], redimension[1], 3), dtype=np.uint8)
+        self._entrada = None
+        self.base = torchvision.transforms.Compose([
+            torchvision.transforms.Resize(redimension),
+            torchvision.transforms.ToTensor(),
+            torchvision.transforms.Normalize(mean=(0.485, 0.456, 0.406),
+                                             std=(0.229, 0.224, 0.225))
+        ])
+        alto, ancho = redimension
+        if estrategia == "centro":
+            self.posiciones = [(int(round((alto - tamano) / 2.0)), int(round((ancho - tamano) / 2.0)))]
+        elif estrategia == "aleatorio":
+            self.posiciones = None
+            self.n_aleatorios = max(1, n_recortes)
+        elif estrategia == "mosaico":
+            filas = np.linspace(0, alto - tamano, math.ceil(alto / tamano)).round().astype(int)
+            columnas = np.linspace(0, ancho - tamano, math.ceil(ancho / tamano)).round().astype(int)
+            self.posiciones = [(int(y), int(x)) for y in filas for x in columnas]
+        else:
+            raise ValueError(f"Estrategia de recorte desconocida: {estrategia}")
+
+    @property
+    def n_recortes(self):
+        return self.n_aleatorios if self.posiciones is None else len(self.posiciones)
+
+    def _posiciones(self, alto, ancho):
+        if self.posiciones is not None:
+            return self.posiciones
+        ys = torch.randint(0, alto - self.tamano + 1, (self.n_aleatorios,)).tolist()
+        xs = torch.randint(0, ancho - self.tamano + 1, (self.n_aleatorios,)).tolist()
+        return list(zip(ys, xs))
+
+    def __call__(self, img):
+        t = self.base(img)
+        return torch.stack([t[:, y:y + self.tamano, x:x + self.tamano] for y, x in self._posiciones(*t.shape[1:])])
+
+    def _buffer_entrada(self, n):
+        """Devuelve un tensor (n, 3, tamano, tamano) reutilizable; solo se reasigna si hace falta más espacio."""
+        if self._entrada is None or self._entrada.shape[0] < n:
+            self._entrada = torch.empty((n, 3, self.tamano, self.tamano), dtype=torch.float32,
+                                        pin_memory=torch.cuda.is_available())
+        return self._entrada[:n]
+
+    def lote_desde_frames(self, frames):
+        """Preprocesa frames BGR en el tensor de entrada reutilizable y devuelve (tensor (N*K, 3, t, t), K)."""
+        alto, ancho = self.redimension
+        k = self.n_recortes
+        entrada = self._buffer_entrada(len(frames) * k)
+        destino = entrada.numpy()
+        i = 0
+        for frame in frames:
+            cv2.resize(frame, (ancho, alto), dst=self._redimensionado, interpolation=cv2.INTER_AREA)
+            for y, x in self._posiciones(alto, ancho):
+                # BGR -> RGB y HWC -> CHW como vista, sin copias intermedias
+                recorte = self._redimensionado[y:y + self.tamano, x:x + self.tamano, ::-1].transpose(2, 0, 1)
+                np.multiply(recorte, self._escala, out=destino[i], casting='unsafe')
+                np.add(destino[i], self._desplazamiento, out=destino[i])
+                i += 1
+        return entrada, k
+
+def load_hyperiqa_model(model_path=MODEL_PATH, device=None, optimizado=False, compilar=False,
+                        cuantizado=False, recortes="centro", n_recortes=1, preprocesado="cv2"):
+    """Carga el modelo HyperIQA preentrenado (eager, optimizado o cuantizado)."""
+    if cuantizado:
+        device = torch.device("cpu")
+    elif device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    if cuantizado:
+        from quantization import cargar_modelo_cuantizado
+        model_hyper = cargar_modelo_cuantizado(model_path)
+    elif optimizado:
+        from model_export import cargar_modelo_optimizado
+        model_hyper = cargar_modelo_optimizado(model_path, device, compilar=compilar)
+    else:
+        model_hyper = construir_hypernet(model_path, device)
 
-    transforms = torchvision.transforms.Compose([
-        torchvision.transforms.Resize((512, 384)),
-        torchvision.transforms.CenterCrop(size=224),
-        torchvision.transforms.ToTensor(),
-        torchvision.transforms.Normalize(mean=(0.485, 0.456, 0.406),
-                                         std=(0.229, 0.224, 0.225))
-    ])
+    transforms = RecortesHyperIQA(recortes, n_recortes, preprocesado=preprocesado)
     return model_hyper, transforms, device
 
 # =========================================================
@@ -50,31 +143,61 @@ def calcular_entropia(gray):
     """Calcula la entropía de Shannon de una imagen en escala de grises."""
     return shannon_entropy(gray)
 
+def inferir_scores(model_hyper, imgs):
+    """Ejecuta HyperIQA sobre un lote (N, 3, 224, 224) y devuelve un tensor con N scores."""
+    with torch.inference_mode():
+        if isinstance(model_hyper, models.HyperNet):
+            paras = model_hyper(imgs)
+            pred = models.TargetNet(paras)(paras['target_in_vec'])
+        else:
+            pred = model_hyper(imgs.contiguous(memory_format=torch.channels_last))
+    return pred.reshape(-1)
+
+def preprocesar_lote(frames, transforms):
+    """Aplica las transformaciones a cada frame y devuelve (tensor (N*K, 3, 224, 224), K recortes por frame)."""
+    if getattr(transforms, "preprocesado", "pil") == "cv2":
+        return transforms.lote_desde_frames(frames)
+    recortes = []
+    for frame in frames:
+        t = transforms(pil_loader_from_frame(frame))
+        recortes.append(t if t.dim() == 4 else t.unsqueeze(0))
+    return torch.cat(recortes), recortes[0].shape[0]
+
 def evaluar_hyperiqa(frame, model_hyper, transforms, device):
-    """Evalúa la calidad de un frame con HyperIQA (dos recortes aleatorios)."""
-    pred_scores = []
-    for _ in range(2):  # Mayor robustez
-        img = pil_loader_from_frame(frame)
-        img = transforms(img).unsqueeze(0).to(device)
-        with torch.no_grad():
-            paras = model_hyper(img)
-            model_target = models.TargetNet(paras)
-            for param in model_target.parameters():
-                param.requires_grad = False
-            pred = model_target(paras['target_in_vec'])
-        pred_scores.append(float(pred.item()))
-    return np.mean(pred_scores)
-
-def dividir_video_en_clips(video_path, clips_dir, duracion_clip=2):
+    """Evalúa la calidad de un frame con HyperIQA (media de los recortes de la estrategia configurada)."""
+    return float(evaluar_hyperiqa_lote([frame], model_hyper, transforms, device)[0])
+
+def evaluar_hyperiqa_lote(frames, model_hyper, transforms, device, batch_size=16):
+    """Evalúa N frames con HyperIQA en lotes: un solo HyperNet y un solo TargetNet por lote. Devuelve N scores."""
+    scores = []
+    for inicio in range(0, len(frames), batch_size):
+        lote = frames[inicio:inicio + batch_size]
+        imgs, k = preprocesar_lote(lote, transforms)
+        pred = inferir_scores(model_hyper, imgs.to(device, non_blocking=True))
+        scores.extend(pred.reshape(len(lote), k).mean(dim=1).cpu().tolist())
+    return np.array(scores, dtype=np.float64)
+
+def calcular_metricas(frame):
+    """Calcula (nitidez, contraste, entropía) de un frame BGR."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return calcular_nitidez(gray), calcular_contraste(gray), calcular_entropia(gray)
+
+def combinar_puntuacion(nitidez, contraste, entropia, hyperiqa):
+    """Combina las métricas en la puntuación compuesta usada para elegir el mejor frame."""
+    return 0.3 * nitidez + 0.2 * contraste + 0.2 * entropia + 0.3 * hyperiqa
+
+def puntuar_frame(frame, model_hyper, transforms, device):
+    """Calcula la puntuación compuesta (métricas OpenCV + HyperIQA) de un frame BGR."""
+    nitidez, contraste, entropia = calcular_metricas(frame)
+    hyperiqa = evaluar_hyperiqa(frame, model_hyper, transforms, device)
+    return combinar_puntuacion(nitidez, contraste, entropia, hyperiqa)
+
+def dividir_video_en_clips(video_path, clips_dir, duracion_clip=2, decodificador=None):
     """Divide un video en clips de duración específica (usa .avi y XVID para máxima compatibilidad)."""
     os.makedirs(clips_dir, exist_ok=True)
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise Exception(f"No se pudo abrir el video: {video_path}")
-
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Los clips se guardan a resolución completa aunque el decodificador reduzca para puntuar
+    cap, fps, total_frames = abrir_video(video_path, decodificador and decodificador.completo())
     frames_por_clip = duracion_clip * fps
     clip_idx = 1
     frame_idx = 0
@@ -100,8 +223,8 @@ def dividir_video_en_clips(video_path, clips_dir, duracion_clip=2):
 
     cap.release()
 
-def extraer_frames_de_clips(clips_dir, frameclips_dir):
-    """Extrae frames de los clips de video y los guarda como imágenes."""
+def extraer_frames_de_clips(clips_dir, frameclips_dir, muestreo=None, decodificador=None):
+    """Extrae frames de los clips de video y los guarda como imágenes (según la política de muestreo)."""
     os.makedirs(frameclips_dir, exist_ok=True)
     for clip_file in sorted(os.listdir(clips_dir)):
         if not (clip_file.endswith('.avi') or clip_file.endswith('.mp4')):
@@ -110,18 +233,14 @@ def extraer_frames_de_clips(clips_dir, frameclips_dir):
         clip_name = os.path.splitext(clip_file)[0]
         out_dir = os.path.join(frameclips_dir, clip_name)
         os.makedirs(out_dir, exist_ok=True)
-        cap = cv2.VideoCapture(clip_path)
-        idx = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        cap, fps, _ = abrir_video(clip_path, decodificador and decodificador.completo())
+        for idx, frame in leer_frames(cap, muestreo=muestreo, fps=fps):
             frame_path = os.path.join(out_dir, f"frame{idx:04d}.jpg")
             cv2.imwrite(frame_path, frame)
-            idx += 1
         cap.release()
 
-def seleccionar_mejor_frame_por_clip(frameclips_dir, framerep_dest, model_hyper, transforms, device, progress_callback=None):
+def seleccionar_mejor_frame_por_clip(frameclips_dir, framerep_dest, model_hyper, transforms, device, progress_callback=None,
+                                     escritor=None):
     """Selecciona el mejor frame de cada clip basado en la calidad estimada."""
     os.makedirs(framerep_dest, exist_ok=True)
     clip_folders = [f for f in sorted(os.listdir(frameclips_dir)) if os.path.isdir(os.path.join(frameclips_dir, f))]
@@ -129,46 +248,552 @@ def seleccionar_mejor_frame_por_clip(frameclips_dir, framerep_dest, model_hyper,
     for idx, clip_folder in enumerate(clip_folders, 1):
         clip_path = os.path.join(frameclips_dir, clip_folder)
         best_score = -float('inf')
-        best_frame_path = None
+        best_frame = None
         for frame_file in sorted(os.listdir(clip_path)):
             if not frame_file.endswith('.jpg'):
                 continue
             frame_path = os.path.join(clip_path, frame_file)
             frame = cv2.imread(frame_path)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            nitidez = calcular_nitidez(gray)
-            contraste = calcular_contraste(gray)
-            entropia = calcular_entropia(gray)
-            hyperiqa = evaluar_hyperiqa(frame, model_hyper, transforms, device)
-            score = 0.3 * nitidez + 0.2 * contraste + 0.2 * entropia + 0.3 * hyperiqa
+            score = puntuar_frame(frame, model_hyper, transforms, device)
             if score > best_score:
                 best_score = score
-                best_frame_path = frame_path
-        if best_frame_path:
+                best_frame = frame
+        if best_frame is not None:
             out_name = f"{idx}.webp"  # SOLO el número del clip
             out_path = os.path.join(framerep_dest, out_name)
-            frame = cv2.imread(best_frame_path)
-            cv2.imwrite(out_path, frame)
+            if escritor is not None:
+                escritor.escribir(out_path, best_frame)
+            else:
+                cv2.imwrite(out_path, best_frame)
         if progress_callback:
             progress_callback(idx, total_clips)
 
-def flujo_completo(video_path, clips_dir, frameclips_dir, framerep_dest, duracion_clip, model_hyper, transforms, device, progress_callback=None):
-    """Ejecuta el flujo completo: dividir video, extraer frames y seleccionar mejor frame por clip."""
-    dividir_video_en_clips(video_path, clips_dir, duracion_clip=duracion_clip)
-    extraer_frames_de_clips(clips_dir, frameclips_dir)
-    seleccionar_mejor_frame_por_clip(frameclips_dir, framerep_dest, model_hyper, transforms, device, progress_callback=progress_callback)
+# =========================================================
+# --- MODO STREAMING (UNA SOLA DECODIFICACIÓN) ---
+# =========================================================
+def abrir_video(video_path, decodificador=None):
+    """Abre un video con el decodificador indicado y devuelve (cap, fps, total_frames)."""
+    cap = (decodificador or Decodificador()).abrir(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return cap, fps, total_frames
+
+def paso_de_muestreo(muestreo, fps):
+    """Traduce una política de muestreo ('todos' | 'cada' | 'fps' | 'adaptativo', valor) a un paso en frames."""
+    modo, valor = muestreo if muestreo else ("todos", None)
+    if modo == "todos":
+        return 1
+    if modo == "cada":
+        return max(1, int(valor))
+    if modo == "fps":
+        return max(1, round(fps / valor)) if fps and valor else 1
+    if modo == "adaptativo":
+        return 1
+    raise ValueError(f"Modo de muestreo desconocido: {modo}")
+
+def diferencia_entre_frames(anterior, actual):
+    """Diferencia absoluta media (0-255) entre dos miniaturas en escala de grises."""
+    return float(cv2.absdiff(anterior, actual).mean())
+
+def posicionar_video(cap, frame_idx):
+    """Salta al frame frame_idx y devuelve la posición real alcanzada (0 si el salto no es exacto)."""
+    if frame_idx <= 0:
+        return 0
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx):
+        posicion = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if 0 < posicion <= frame_idx:
+            return posicion
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return 0
+
+def leer_frames(cap, muestreo=None, fps=None, inicio=0, fin=None):
+    """Generador que decodifica cada frame muestreado una sola vez y entrega (indice, frame)."""
+    adaptativo = bool(muestreo) and muestreo[0] == "adaptativo"
+    paso = paso_de_muestreo(muestreo, fps)
+    paso_max = max(1, (fps or 2) // 2)
+    anterior = None
+    idx = inicio
+    while fin is None or idx < fin:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield idx, frame
+        if adaptativo:
+            miniatura = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, 36), interpolation=cv2.INTER_AREA)
+            if anterior is not None and diferencia_entre_frames(anterior, miniatura) < muestreo[1]:
+                paso = min(paso_max, paso * 2)
+            else:
+                paso = max(1, paso // 2)
+            anterior = miniatura
+        idx += 1
+        for _ in range(paso - 1):
+            if fin is not None and idx >= fin:
+                return
+            if not cap.grab():
+                return
+            idx += 1
+
+def ventanas_de_clip(frames, frames_por_clip):
+    """Agrupa el flujo (indice, frame) en ventanas de clip perezosas y entrega (clip_idx, ventana) desde 1."""
+    for clave, ventana in itertools.groupby(frames, key=lambda item: item[0] // frames_por_clip):
+        yield clave + 1, ventana
+
+def volcar_depuracion(ventana, clip_idx, fps, clips_dir=None, frameclips_dir=None):
+    """Reenvía los frames de la ventana y, opcionalmente, los guarda como clip .avi y JPEGs de depuración."""
+    out = None
+    out_dir = None
+    if frameclips_dir:
+        out_dir = os.path.join(frameclips_dir, f"clip{clip_idx}")
+        os.makedirs(out_dir, exist_ok=True)
+    try:
+        for n, (frame_idx, frame) in enumerate(ventana):
+            if clips_dir:
+                if out is None:
+                    h, w = frame.shape[:2]
+                    clip_path = os.path.join(clips_dir, f"clip{clip_idx}.avi")
+                    out = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*'XVID'), fps, (w, h))
+                out.write(frame)
+            if out_dir:
+                cv2.imwrite(os.path.join(out_dir, f"frame{n:04d}.jpg"), frame)
+            yield frame_idx, frame
+    finally:
+        if out is not None:
+            out.release()
+
+def prefiltrar_candidatos(candidatos, top_k, motor=None):
+    """Etapa 1: conserva los top_k candidatos (indice, frame, metricas) por puntuación OpenCV, ordenados por índice."""
+    heap = []
+    for frame_idx, frame, metricas in candidatos:
+        parcial = motor.parcial(metricas) if motor else combinar_puntuacion(*metricas, 0.0)
+        # -frame_idx desempata a favor del frame más temprano y evita comparar arrays
+        item = (parcial, -frame_idx, frame_idx, frame, metricas)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    return sorted(((frame_idx, frame, metricas) for _, _, frame_idx, frame, metricas in heap), key=lambda c: c[0])
+
+def seleccionar_de_candidatos(candidatos, model_hyper, transforms, device, batch_size=16, top_k=None, motor=None,
+                              cache=None):
+    """Elige el mejor (indice, frame, score) de un iterable de (indice, frame, metricas), o None si está vacío."""
+    motor = motor or MotorPuntuacion()
+    candidatos = motor.observar_candidatos(candidatos)
+    if top_k:
+        candidatos = prefiltrar_candidatos(candidatos, top_k, motor)
+        if motor.salida_temprana:
+            # Los más prometedores primero: así la cota descarta antes al resto
+            candidatos.sort(key=lambda c: -motor.parcial(c[2]))
+
+    def evaluar_frames(frames):
+        return evaluar_hyperiqa_lote(frames, model_hyper, transforms, device, batch_size=batch_size)
+
+    def evaluar(lote):
+        if cache is not None:
+            return cache.completar_hyperiqa(lote, evaluar_frames)
+        return evaluar_frames([frame for _, frame, _ in lote])
+
+    return motor.elegir(candidatos, evaluar, batch_size=batch_size)
+
+def candidatos_de_ventana(ventana, batch_size=16, cache=None):
+    """Genera (indice, frame, metricas) calculando las métricas OpenCV en lotes vectorizados."""
+    ventana = iter(ventana)
+    grises = None
+    while True:
+        lote = list(itertools.islice(ventana, batch_size))
+        if not lote:
+            return
+        grises = apilar_grises([frame for _, frame in lote], grises)
+        metricas_lote = calcular_metricas_lote(grises)
+        if cache is not None:
+            cache.guardar_metricas([frame_idx for frame_idx, _ in lote], np.stack(metricas_lote, axis=1))
+        for (frame_idx, frame), metricas in zip(lote, zip(*metricas_lote)):
+            yield frame_idx, frame, metricas
+
+def mejor_frame_de_ventana(ventana, model_hyper, transforms, device, batch_size=16, top_k=None, motor=None,
+                           cache=None):
+    """Puntúa los frames de una ventana y devuelve (indice, frame, score) del mejor, o None si está vacía."""
+    candidatos = candidatos_de_ventana(ventana, batch_size=batch_size, cache=cache)
+    return seleccionar_de_candidatos(candidatos, model_hyper, transforms, device, batch_size=batch_size, top_k=top_k,
+                                     motor=motor, cache=cache)
+
+def reporte_prefiltro(video_path, duracion_clip, model_hyper, transforms, device, top_k=5, batch_size=16,
+                      muestreo=None, decodificador=None):
+    """Compara el selector en dos etapas con la evaluación exhaustiva sobre un video."""
+    cap, fps, _ = abrir_video(video_path, decodificador)
+    frames_por_clip = max(1, duracion_clip * fps)
+    frames = leer_frames(cap, muestreo=muestreo, fps=fps)
+    ventanas = cambios = evaluaciones_exhaustivo = evaluaciones_prefiltro = 0
+    try:
+        for _, ventana in ventanas_de_clip(frames, frames_por_clip):
+            registros = []  # (indice, parcial, score) sin retener los frames
+            candidatos = candidatos_de_ventana(ventana, batch_size=batch_size)
+            while True:
+                lote = list(itertools.islice(candidatos, batch_size))
+                if not lote:
+                    break
+                hyperiqa = evaluar_hyperiqa_lote([frame for _, frame, _ in lote], model_hyper, transforms, device,
+                                                 batch_size=batch_size)
+                for (frame_idx, _, metricas), hyper in zip(lote, hyperiqa):
+                    registros.append((frame_idx, combinar_puntuacion(*metricas, 0.0),
+                                      combinar_puntuacion(*metricas, hyper)))
+            if not registros:
+                continue
+            exhaustivo = max(registros, key=lambda r: (r[2], -r[0]))[0]
+            sobrevivientes = sorted(registros, key=lambda r: (-r[1], r[0]))[:top_k]
+            prefiltro = max(sobrevivientes, key=lambda r: (r[2], -r[0]))[0]
+            ventanas += 1
+            cambios += int(exhaustivo != prefiltro)
+            evaluaciones_exhaustivo += len(registros)
+            evaluaciones_prefiltro += len(sobrevivientes)
+    finally:
+        cap.release()
+
+    return {
+        "ventanas": ventanas,
+        "cambios": cambios,
+        "tasa_cambio": cambios / ventanas if ventanas else 0.0,
+        "evaluaciones_hyperiqa_exhaustivo": evaluaciones_exhaustivo,
+        "evaluaciones_hyperiqa_prefiltro": evaluaciones_prefiltro,
+    }
+
+def seleccionar_mejor_frame_streaming(video_path, framerep_dest, duracion_clip, model_hyper, transforms, device,
+                                      progress_callback=None, clips_dir=None, frameclips_dir=None, batch_size=16,
+                                      top_k=None, muestreo=None, motor=None, escritor=None, manifiesto=None,
+                                      cache=None, decodificador=None):
+    """Selecciona el mejor frame por ventana de clip decodificando el video una sola vez, sin archivos intermedios."""
+    motor = motor or MotorPuntuacion()
+    os.makedirs(framerep_dest, exist_ok=True)
+    for debug_dir in (clips_dir, frameclips_dir):
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+
+    cap, fps, total_frames = abrir_video(video_path, decodificador)
+    lector = LectorResolucionCompleta(video_path, decodificador)
+    frames_por_clip = max(1, duracion_clip * fps)
+    total_clips = math.ceil(total_frames / frames_por_clip) if total_frames > 0 else 0
+    inicio = 0
+    if manifiesto is not None:
+        inicio = posicionar_video(cap, (manifiesto.primer_pendiente() - 1) * frames_por_clip)
+    frames = leer_frames(cap, muestreo=muestreo, fps=fps, inicio=inicio)
+    try:
+        with EscritorWebp() if escritor is None else contextlib.nullcontext(escritor) as escritor:
+            for clip_idx, ventana in ventanas_de_clip(frames, frames_por_clip):
+                if manifiesto is not None and manifiesto.hecho(clip_idx):
+                    for _ in ventana:
+                        pass
+                    continue
+                if clips_dir or frameclips_dir:
+                    ventana = volcar_depuracion(ventana, clip_idx, fps, clips_dir, frameclips_dir)
+                mejor = mejor_frame_de_ventana(ventana, model_hyper, transforms, device, batch_size=batch_size,
+                                               top_k=top_k, motor=motor, cache=cache)
+                if mejor is not None:
+                    out_path = os.path.join(framerep_dest, f"{clip_idx}.webp")  # SOLO el número del clip
+                    escritor.escribir(out_path, lector.frame(mejor[0], mejor[1]))
+                if manifiesto is not None:
+                    manifiesto.registrar(clip_idx, mejor and mejor[0], mejor and mejor[2], motor=motor)
+                if progress_callback:
+                    progress_callback(clip_idx, max(total_clips, clip_idx))
+        if cache is not None:
+            cache.registrar_fin(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    finally:
+        cap.release()
+        lector.cerrar()
+    if manifiesto is not None:
+        manifiesto.finalizar(motor)
+
+def leer_frame(cap, frame_idx):
+    """Decodifica un único frame por su índice real, o devuelve None si el video es más corto."""
+    posicion = posicionar_video(cap, frame_idx)
+    for _ in range(frame_idx - posicion):
+        if not cap.grab():
+            return None
+    ret, frame = cap.read()
+    return frame if ret else None
+
+class LectorResolucionCompleta:
+    """Entrega el frame ganador a resolución completa, releyéndolo por su índice si hace falta."""
+    def __init__(self, video_path, decodificador=None):
+        self.video_path = video_path
+        self.decodificador = (decodificador or Decodificador()).completo()
+        self.reducido = decodificador is not None and decodificador.reducido
+        self.cap = None
+
+    def frame(self, frame_idx, frame):
+        if frame is not None and not self.reducido:
+            return frame
+        if self.cap is None:
+            self.cap, _, _ = abrir_video(self.video_path, self.decodificador)
+        completo = leer_frame(self.cap, frame_idx)
+        return completo if completo is not None else frame
+
+    def frames_en_orden(self, indices):
+        """Genera (indice, frame) a resolución completa de los índices dados, en una sola pasada hacia delante."""
+        indices = sorted(set(indices))
+        if not indices:
+            return
+        if self.cap is None:
+            self.cap, _, _ = abrir_video(self.video_path, self.decodificador)
+        posicion = posicionar_video(self.cap, indices[0])
+        for frame_idx in indices:
+            while posicion < frame_idx:
+                if not self.cap.grab():
+                    return
+                posicion += 1
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            posicion += 1
+            yield frame_idx, frame
+
+    def cerrar(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+def leer_ventana(cap, inicio, fin, muestreo=None, fps=None):
+    """Genera (indice, frame) de los frames muestreados con indice en [inicio, fin)."""
+    posicion = posicionar_video(cap, inicio)
+    for frame_idx, frame in leer_frames(cap, muestreo=muestreo, fps=fps, inicio=posicion):
+        if frame_idx >= fin:
+            return
+        if frame_idx >= inicio:
+            yield frame_idx, frame
+
+def reagregar_desde_cache(video_path, framerep_dest, duracion_clip, model_hyper, transforms, device, cache,
+                          progress_callback=None, batch_size=16, top_k=None, muestreo=None, motor=None,
+                          escritor=None, manifiesto=None, decodificador=None):
+    """Selecciona el mejor frame por ventana desde el almacén de scores; devuelve False si no cubre el video."""
+    if cache.frames is None or (muestreo and muestreo[0] == "adaptativo"):
+        return False
+    cap, fps, _ = abrir_video(video_path, decodificador)
+    indices = np.arange(0, cache.frames, paso_de_muestreo(muestreo, fps))
+    if not len(indices) or not cache.tiene_metricas(indices):
+        cap.release()
+        return False
+
+    motor = motor or MotorPuntuacion()
+    os.makedirs(framerep_dest, exist_ok=True)
+    metricas = cache.metricas(indices)
+    lector = LectorResolucionCompleta(video_path, decodificador)
+    frames_por_clip = max(1, duracion_clip * fps)
+    total_clips = math.ceil(cache.frames / frames_por_clip)
+    por_leer = {}
+    hechos = 0
+
+    def registrar(clip_idx, mejor):
+        nonlocal hechos
+        if manifiesto is not None:
+            manifiesto.registrar(clip_idx, mejor and mejor[0], mejor and mejor[2], motor=motor)
+        hechos += 1
+        if progress_callback:
+            progress_callback(hechos, total_clips)
+
+    try:
+        with EscritorWebp() if escritor is None else contextlib.nullcontext(escritor) as escritor:
+            for clip_idx in range(1, total_clips + 1):
+                inicio = (clip_idx - 1) * frames_por_clip
+                desde, hasta = np.searchsorted(indices, [inicio, inicio + frames_por_clip])
+                if desde == hasta or (manifiesto is not None and manifiesto.hecho(clip_idx)):
+                    hechos += 1
+                    continue
+                candidatos = [(int(i), None, tuple(m)) for i, m in zip(indices[desde:hasta], metricas[desde:hasta])]
+                # Estado de tamaño acotado (ver MotorPuntuacion.estado) para deshacer la agregación parcial
+                estado = motor.estado()
+                try:
+                    mejor = seleccionar_de_candidatos(candidatos, model_hyper, transforms, device,
+                                                      batch_size=batch_size, top_k=top_k, motor=motor, cache=cache)
+                except ScoresIncompletos:
+                    motor.restaurar(estado)
+                    ventana = leer_ventana(cap, inicio, inicio + frames_por_clip, muestreo=muestreo, fps=fps)
+                    mejor = mejor_frame_de_ventana(ventana, model_hyper, transforms, device, batch_size=batch_size,
+                                                   top_k=top_k, motor=motor, cache=cache)
+                if mejor is not None and mejor[1] is not None and not lector.reducido:
+                    escritor.escribir(os.path.join(framerep_dest, f"{clip_idx}.webp"), mejor[1])
+                    registrar(clip_idx, mejor)
+                elif mejor is not None:
+                    por_leer.setdefault(mejor[0], []).append((clip_idx, mejor))
+                else:
+                    registrar(clip_idx, None)
+
+            for frame_idx, frame in lector.frames_en_orden(por_leer):
+                for clip_idx, mejor in por_leer.pop(frame_idx):
+                    escritor.escribir(os.path.join(framerep_dest, f"{clip_idx}.webp"), frame)
+                    registrar(clip_idx, mejor)
+            # Ganadores más allá del final real del video: se anotan sin imagen
+            for ventanas in por_leer.values():
+                for clip_idx, mejor in ventanas:
+                    registrar(clip_idx, mejor)
+    finally:
+        cap.release()
+        lector.cerrar()
+    if manifiesto is not None:
+        manifiesto.finalizar(motor)
+    return True
 
 # =========================================================
-# --- MAIN PARA EJECUCIÓN DIRECTA ---
+# --- MODO SINCRONIZADO CON LAS COORDENADAS GPS ---
 # =========================================================
-if __name__ == "__main__":
-    # --- Configuración de entrada/salida ---
-    video_path = ""
-    output_dir = ""
+def tramos_en_frames(tramos, fps):
+    """Convierte tramos [(t0, t1)] en segundos de video a rangos [(inicio, fin)] de frames (al menos un frame)."""
+    rangos = []
+    for t0, t1 in tramos:
+        inicio = max(0, int(round(t0 * fps)))
+        rangos.append((inicio, max(inicio + 1, int(round(t1 * fps)))))
+    return rangos
+
+def leer_tramos(cap, rangos, fps, muestreo=None, posicion=0):
+    """Genera (indice, frame) de los rangos de frames [(inicio, fin)] en orden, partiendo de la posición actual de cap."""
+    salto_max = 2 * fps
+    for inicio, fin in rangos:
+        if inicio < posicion or inicio - posicion > salto_max:
+            posicion = posicionar_video(cap, inicio)
+        while posicion < inicio and cap.grab():
+            posicion += 1
+        yield from leer_frames(cap, muestreo=muestreo, fps=fps, inicio=posicion, fin=fin)
+        posicion = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+def seleccionar_mejor_frame_gps(video_path, framerep_dest, ventanas, model_hyper, transforms, device,
+                                progress_callback=None, batch_size=16, top_k=None, muestreo=None, motor=None,
+                                escritor=None, manifiesto=None, cache=None, decodificador=None):
+    """Elige el mejor frame de cada ventana (segundo, [(t0, t1), ...]) y lo guarda como {segundo}.webp."""
+    motor = motor or MotorPuntuacion()
+    os.makedirs(framerep_dest, exist_ok=True)
+    cap, fps, total_frames = abrir_video(video_path, decodificador)
+    lector = LectorResolucionCompleta(video_path, decodificador)
+    ventanas = [(segundo, tramos_en_frames(tramos, fps)) for segundo, tramos in ventanas]
+    if total_frames > 0:
+        ventanas = [(segundo, rangos) for segundo, rangos in ventanas if rangos[0][0] < total_frames]
+    posicion = 0
+    try:
+        with EscritorWebp() if escritor is None else contextlib.nullcontext(escritor) as escritor:
+            for n, (segundo, rangos) in enumerate(ventanas, start=1):
+                if manifiesto is not None and manifiesto.hecho(segundo):
+                    continue
+                ventana = leer_tramos(cap, rangos, fps, muestreo=muestreo, posicion=posicion)
+                mejor = mejor_frame_de_ventana(ventana, model_hyper, transforms, device, batch_size=batch_size,
+                                               top_k=top_k, motor=motor, cache=cache)
+                posicion = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                if mejor is not None:
+                    out_path = os.path.join(framerep_dest, f"{segundo}.webp")
+                    escritor.escribir(out_path, lector.frame(mejor[0], mejor[1]))
+                if manifiesto is not None:
+                    manifiesto.registrar(segundo, mejor and mejor[0], mejor and mejor[2], motor=motor)
+                if progress_callback:
+                    progress_callback(n, len(ventanas))
+    finally:
+        cap.release()
+        lector.cerrar()
+    if manifiesto is not None:
+        manifiesto.finalizar(motor)
 
-    # --- Cargar modelo y transformaciones ---
-    model_hyper, transforms, device = load_hyperiqa_model('./pretrained/koniq_pretrained.pkl')
+def flujo_completo(video_path, clips_dir, frameclips_dir, framerep_dest, duracion_clip, model_hyper, transforms, device,
+                   progress_callback=None, streaming=True, guardar_intermedios=False, batch_size=16, top_k=None,
+                   muestreo=None, paralelo=False, num_workers=None, pesos=None, normalizacion="ninguna",
+                   salida_temprana=False, calidad_webp=None, reanudar=True,
+                   version_modelo=None, ventanas_gps=None, decodificador=None, usar_cache=True):
+    """Ejecuta el flujo completo: extraer y seleccionar el mejor frame por clip (o por ventana GPS)."""
+    if not streaming:
+        # El flujo clásico solo admite muestreo, decodificador y calidad_webp
+        no_soportados = {"top_k": top_k is not None, "paralelo": paralelo, "pesos": pesos is not None,
+                         "normalizacion": normalizacion != "ninguna", "salida_temprana": salida_temprana,
+                         "version_modelo": version_modelo is not None, "ventanas_gps": ventanas_gps is not None}
+        usados = [nombre for nombre, usado in no_soportados.items() if usado]
+        if usados:
+            raise ValueError(f"streaming=False no admite: {', '.join(usados)}")
+    motor =MotorPuntuacion(pesos, normalizacion=normalizacion, salida_temprana=salida_temprana)
+    if version_modelo and decodificador is not None and decodificador.reducido:
+        # Las métricas sobre frames reducidos no son comparables con las de resolución completa
+        version_modelo = f"{version_modelo}-w{decodificador.ancho_max}"
+    manifiesto = None
+    if streaming:
+        parametros = {"duracion_clip": duracion_clip, "muestreo": muestreo, "top_k": top_k, "pesos": motor.pesos,
+                      "normalizacion": normalizacion, "salida_temprana": salida_temprana, "modelo": version_modelo,
+                      "ventanas_gps": ventanas_gps, "calidad_webp": calidad_webp}
+        manifiesto = ManifiestoExtraccion(framerep_dest, video_path, parametros, reiniciar=not reanudar)
+        if manifiesto.completo:
+            if progress_callback:
+                progress_callback(manifiesto.total_clips, manifiesto.total_clips)
+            return
+        motor.restaurar(manifiesto.estado_motor)
+    cache = None
+    if streaming and version_modelo and usar_cache:
+        # El almacén se crea con el tamaño del video para no tener que duplicarlo mientras se llena
+        cap, _, total_frames = abrir_video(video_path, decodificador)
+        cap.release()
+        cache = CacheScores(video_path, version_modelo, frames_estimados=total_frames)
+    with EscritorWebp(calidad_webp) as escritor:
+        if streaming and ventanas_gps is not None and not paralelo:
+            seleccionar_mejor_frame_gps(
+                video_path, framerep_dest, ventanas_gps, model_hyper, transforms, device,
+                progress_callback=progress_callback,
+                batch_size=batch_size,
+                top_k=top_k,
+                muestreo=muestreo,
+                motor=motor,
+                escritor=escritor,
+                manifiesto=manifiesto,
+                cache=cache,
+                decodificador=decodificador
+            )
+        elif ventanas_gps is None and cache is not None and reagregar_desde_cache(
+                video_path, framerep_dest, duracion_clip, model_hyper, transforms, device, cache,
+                progress_callback=progress_callback,
+                batch_size=batch_size,
+                top_k=top_k,
+                muestreo=muestreo,
+                motor=motor,
+                escritor=escritor,
+                manifiesto=manifiesto,
+                decodificador=decodificador):
+            print("♻️ Frames reagregados desde la caché de scores")
+        elif streaming and paralelo:
+            from frame_pipeline import procesar_video_en_paralelo
+            procesar_video_en_paralelo(
+                video_path, framerep_dest, duracion_clip, model_hyper, transforms, device,
+                progress_callback=progress_callback,
+                clips_dir=clips_dir if guardar_intermedios else None,
+                frameclips_dir=frameclips_dir if guardar_intermedios else None,
+                batch_size=batch_size,
+                top_k=top_k,
+                muestreo=muestreo,
+                num_workers=num_workers,
+                motor=motor,
+                escritor=escritor,
+                manifiesto=manifiesto,
+                cache=cache,
+                decodificador=decodificador,
+                ventanas_gps=ventanas_gps
+            )
+        elif streaming:
+            seleccionar_mejor_frame_streaming(
+                video_path, framerep_dest, duracion_clip, model_hyper, transforms, device,
+                progress_callback=progress_callback,
+                clips_dir=clips_dir if guardar_intermedios else None,
+                frameclips_dir=frameclips_dir if guardar_intermedios else None,
+                batch_size=batch_size,
+                top_k=top_k,
+                muestreo=muestreo,
+                motor=motor,
+                escritor=escritor,
+                manifiesto=manifiesto,
+                cache=cache,
+                decodificador=decodificador
+            )
+        else:
+            dividir_video_en_clips(video_path, clips_dir, duracion_clip=duracion_clip, decodificador=decodificador)
+            extraer_frames_de_clips(clips_dir, frameclips_dir, muestreo=muestreo, decodificador=decodificador)
+            seleccionar_mejor_frame_por_clip(frameclips_dir, framerep_dest, model_hyper, transforms, device,
+                                             progress_callback=progress_callback, escritor=escritor)
+    if cache is not None:
+        cache.cerrar()
 
-    # --- Procesar video ---
-    procesar_video(video_path, output_dir, frames_per_clip=60,
-                   model_hyper=model_hyper, transforms=transforms, device=device)
+# =========================================================
+# --- MAIN PARA EJECUCIÓN DIRECTA ---
+# =========================================================
+if __name__ == "__main__":
+    # Ejecución directa sin interfaz gráfica: ver cli.py (python frame_selector.py equivale a "cli.py frames")
+    import sys
+    from cli import main
+    main(["frames"] + sys.argv[1:])
@@ -0,0 +1,60 @@
+# frame_writer.py
+import queue
+import threading
+import cv2
+
+# Marcador de cierre del hilo escritor
+_FIN = object()
+
+# =========================================================
+# --- ESCRITURA WEBP EN SEGUNDO PLANO ---
+# =========================================================
+class EscritorWebp:
+    """Codifica los frames representativos a WebP en un hilo aparte, solapado con la puntuación del siguiente clip."""
+    def __init__(self, calidad=None, capacidad=8):
+        self.parametros = [] if calidad is None else [cv2.IMWRITE_WEBP_QUALITY, int(calidad)]
+        self.cola = queue.Queue(maxsize=capacidad)
+        self.error = None
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def _trabajar(self):
+        while True:
+            item = self.cola.get()
+            if item is _FIN:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self._codificar(*item)
+            except Exception as e:
+                self.error = e
+
+    def _codificar(self, out_path, frame):
+        if not cv2.imwrite(out_path, frame, self.parametros):
+            raise Exception(f"No se pudo escribir el frame: {out_path}")
+
+    def escribir(self, out_path, frame):
+        """Encola un frame BGR para escribirlo en out_path; bloquea si hay demasiadas escrituras pendientes."""
+        if self.error is not None:
+            raise self.error
+        self.cola.put((out_path, frame))
+
+    def cerrar(self):
+        """Espera a que se escriban todos los frames pendientes y propaga el primer error, si lo hubo."""
+        if self.hilo.is_alive():
+            self.cola.put(_FIN)
+            self.hilo.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.cola.put(_FIN)
+            self.hilo.join()
+        return False
@@ -11,7 +11,11 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtGui import QIcon, QPixmap, QCursor
 from Map_generator import generar_mapa_desde_todas_las_subcarpetas
 
-from frame_selector import load_hyperiqa_model, flujo_completo
+from frame_selector import flujo_completo
+from model_cache import MODEL_PATH, obtener_modelo_hyperiqa, precargar_modelo_en_segundo_plano
+from score_cache import version_modelo
+from recorridos import importar_recorrido, ultimo_recorrido, copiar_frames_a_img, leer_coordenadas
+from trayectoria import ventanas_por_segundo
 
 class ProgressDialog(QDialog):
     def __init__(self, parent=None):
@@ -61,42 +65,55 @@ class ProgressDialog(QDialog):
         layout.addWidget(self.progress)
 
         self.setFixedSize(400, 160)
+        self.etapas = {}
 
-    def set_progress(self, value, total):
+    def set_progress(self, value, total, etapa="inferencia"):
         percent = int((value / total) * 100) if total > 0 else 0
+        self.etapas[etapa] = percent
+        if etapa != "inferencia":
+            self.label.setText(
+                f"Decodificando {self.etapas.get('decodificacion', 0)}% · Métricas {self.etapas.get('metricas', 0)}%"
+            )
+            return
         self.progress.setValue(percent)
         self.label.setText(f"Extrayendo frames ({value}/{total})...")
 
 class FrameProcessingThread(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
-    progress = pyqtSignal(int, int)
+    progress = pyqtSignal(int, int, str)
 
-    def __init__(self, video_path, clips_dir, frameclips_dir, framerep_dest, duracion_clip, model_hyper, transforms, device):
+    def __init__(self, video_path, clips_dir, frameclips_dir, framerep_dest, duracion_clip, model_path,
+                 ventanas_gps=None):
         super().__init__()
         self.video_path = video_path
         self.clips_dir = clips_dir
         self.frameclips_dir = frameclips_dir
         self.framerep_dest = framerep_dest
         self.duracion_clip = duracion_clip
-        self.model_hyper = model_hyper
-        self.transforms = transforms
-        self.device = device
+        self.model_path = model_path
+        self.ventanas_gps = ventanas_gps
 
     def run(self):
         try:
-            def progress_callback(val, total):
-                self.progress.emit(val, total)
+            def progress_callback(val, total, etapa="inferencia"):
+                self.progress.emit(val, total, etapa)
+            # Si la precarga aún no terminó, se espera aquí y no en el hilo de la interfaz
+            model_hyper, transforms, device = obtener_modelo_hyperiqa(self.model_path)
+            version = version_modelo(self.model_path)
             flujo_completo(
                 video_path=self.video_path,
                 clips_dir=self.clips_dir,
                 frameclips_dir=self.frameclips_dir,
                 framerep_dest=self.framerep_dest,
                 duracion_clip=self.duracion_clip,
-                model_hyper=self.model_hyper,
-                transforms=self.transforms,
-                device=self.device,
-                progress_callback=progress_callback
+                model_hyper=model_hyper,
+                transforms=transforms,
+                device=device,
+                progress_callback=progress_callback,
+                paralelo=True,
+                version_modelo=version,
+                ventanas_gps=self.ventanas_gps
             )
             self.finished.emit()
         except Exception as e:
@@ -292,14 +309,7 @@ class FrameReviewWindow(QWidget):
 
     def finish_and_close(self):
         # Al pulsar "Enviar / Seguir", copiar los frames restantes a Img/recorridoX/
-        if os.path.exists(self.img_dest):
-            for f in os.listdir(self.img_dest):
-                os.remove(os.path.join(self.img_dest, f))
-        else:
-            os.makedirs(self.img_dest, exist_ok=True)
-        for f in os.listdir(self.img_folder):
-            if f.lower().endswith(".webp"):
-                shutil.copy(os.path.join(self.img_folder, f), os.path.join(self.img_dest, f))
+        copiar_frames_a_img(self.img_folder, self.img_dest)
         self.on_finish_callback()
         self.close()
 
@@ -316,6 +326,7 @@ class MapaApp(QWidget):
         self.crear_barra_navegacion()
         self.crear_vista_mapa()
         self.verificar_mapa_inicial()
+        precargar_modelo_en_segundo_plano(MODEL_PATH)
 
     def crear_boton_icono(self, ruta, tooltip, callback):
         btn = QToolButton()
@@ -387,20 +398,7 @@ class MapaApp(QWidget):
             QMessageBox.warning(self, "Error", "Selecciona un video (.webm) y un archivo de coordenadas (.txt).")
             return
 
-        base_dir_coords = os.path.abspath("Coords")
-        base_dir_vids = os.path.abspath("Vids")
-        n = 1
-        while os.path.exists(os.path.join(base_dir_coords, f"recorrido{n}")):
-            n += 1
-        subfolder = f"recorrido{n}"
-
-        coords_dest = os.path.join(base_dir_coords, subfolder)
-        vids_dest = os.path.join(base_dir_vids, subfolder)
-        os.makedirs(coords_dest, exist_ok=True)
-        os.makedirs(vids_dest, exist_ok=True)
-
-        shutil.copy(coords, os.path.join(coords_dest, "cordenadas.txt"))
-        shutil.copy(video, os.path.join(vids_dest, "video.webm"))
+        subfolder = importar_recorrido(video, coords, os.path.abspath("Coords"), os.path.abspath("Vids"))
 
         generar_mapa_desde_todas_las_subcarpetas()
         self.verificar_mapa_inicial()
@@ -413,11 +411,10 @@ class MapaApp(QWidget):
         base_dir_frameclips = os.path.abspath("FrameClips")
         base_dir_framerep = os.path.abspath("frameRep")
         base_dir_imgs = os.path.abspath("Img")
-        recorridos = [d for d in os.listdir(base_dir_vids) if os.path.isdir(os.path.join(base_dir_vids, d))]
-        if not recorridos:
+        recorrido = ultimo_recorrido(base_dir_vids)
+        if not recorrido:
             QMessageBox.warning(self, "Error", "No hay recorridos para extraer frames.")
             return
-        recorrido = sorted(recorridos, key=lambda x: int(x.replace("recorrido", "")))[-1]
         video_path = os.path.join(base_dir_vids, recorrido, "video.webm")
         coords_path = os.path.join(base_dir_coords, recorrido, "cordenadas.txt")
         if not os.path.exists(video_path) or not os.path.exists(coords_path):
@@ -427,8 +424,6 @@ class MapaApp(QWidget):
         frameclips_dir = os.path.join(base_dir_frameclips, recorrido)
         framerep_dest = os.path.join(base_dir_framerep, recorrido)
         img_dest = os.path.join(base_dir_imgs, recorrido)
-        os.makedirs(clips_dir, exist_ok=True)
-        os.makedirs(frameclips_dir, exist_ok=True)
         os.makedirs(framerep_dest, exist_ok=True)
         os.makedirs(img_dest, exist_ok=True)
 
@@ -437,16 +432,17 @@ class MapaApp(QWidget):
         QApplication.processEvents()
 
         try:
-            model_hyper, transforms, device = load_hyperiqa_model('./pretrained/koniq_pretrained.pkl')
+            # Un .txt ilegible no debe dejar abierto el diálogo de progreso
+            _, segundos = leer_coordenadas(recorrido, base_dir_coords)
             self.thread = FrameProcessingThread(
                 video_path=video_path,
                 clips_dir=clips_dir,
                 frameclips_dir=frameclips_dir,
                 framerep_dest=framerep_dest,
                 duracion_clip=2,
-                model_hyper=model_hyper,
-                transforms=transforms,
-                device=device
+                model_path=MODEL_PATH,
+                # Un frame por segundo con coordenada, con el nombre que busca el mapa
+                ventanas_gps=ventanas_por_segundo(segundos) if segundos else None
             )
             self.thread.finished.connect(self.on_frames_processed)
             self.thread.error.connect(self.on_frames_error)
@@ -456,8 +452,8 @@ class MapaApp(QWidget):
             self.progress_dialog.close()
             QMessageBox.critical(self, "Error", f"Error extrayendo frames: {e}")
 
-    def on_progress_update(self, value, total):
-        self.progress_dialog.set_progress(value, total)
+    def on_progress_update(self, value, total, etapa):
+        self.progress_dialog.set_progress(value, total, etapa)
 
     def on_frames_processed(self):
         self.progress_dialog.close()
@@ -476,11 +472,7 @@ class MapaApp(QWidget):
         QMessageBox.critical(self, "Error", f"Error extrayendo frames: {msg}")
 
     def get_last_recorrido(self):
-        base_dir_vids = os.path.abspath("Vids")
-        recorridos = [d for d in os.listdir(base_dir_vids) if os.path.isdir(os.path.join(base_dir_vids, d))]
-        if not recorridos:
-            return ""
-        return sorted(recorridos, key=lambda x: int(x.replace("recorrido", "")))[-1]
+        return ultimo_recorrido(os.path.abspath("Vids"))
 
     def actualizar_mapa_despues_revision(self):
         generar_mapa_desde_todas_las_subcarpetas()
@@ -514,7 +506,8 @@ class MapaApp(QWidget):
                 os.path.abspath("Labels"),
                 os.path.abspath("Clips"),
                 os.path.abspath("frameclips"),
-                os.path.abspath("frameRep")
+                os.path.abspath("frameRep"),
+                os.path.abspath("Scores")
             ]
 
             for ruta in rutas:
@@ -0,0 +1,233 @@
+# map_tiles.py
+import os
+import json
+import shutil
+import numpy as np
+from track_store import BASE_DIR_COORDS, cargar_track
+from spatial_index import BASE_DIR_IMG, firma_recorrido, fotos_recorrido
+from escritura_atomica import escribir_atomico
+
+# Pirámide de teselas vectoriales junto a MapaFinal.html: Mapa/teselas/{z}/{x}/{y}.js
+DIR_TESELAS = "Mapa/teselas"
+INDICE_TESELAS = "indice.json"
+# Subir al cambiar el contenido de las teselas: invalida todas
+VERSION_TESELAS = 1
+
+# Zooms con datos: el mapa usa el mayor que no supere su zoom actual. Las fotos solo van en ZOOM_FOTOS.
+ZOOMS_TESELAS = (10, 12, 14)
+ZOOM_FOTOS = 14
+# Píxeles por tesela (Leaflet/OSM) y límite de latitud de Web Mercator
+TAMANO_TESELA = 256
+LAT_MAX_MERCATOR = 85.05112878
+
+# =========================================================
+# --- GEOMETRÍA WEB MERCATOR ---
+# =========================================================
+def pixeles(coords, zoom):
+    """Coordenadas (N, 2) [lat, lon] a píxeles globales (x, y) en float al zoom dado."""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    escala = TAMANO_TESELA * 2 ** zoom
+    lat = np.radians(np.clip(coords[:, 0], -LAT_MAX_MERCATOR, LAT_MAX_MERCATOR))
+    x = (coords[:, 1] + 180) / 360 * escala
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * escala
+    return x, y
+
+def teselas_de(coords, zoom):
+    """(x, y) enteros de la tesela de cada coordenada."""
+    x, y = pixeles(coords, zoom)
+    maximo = 2 ** zoom - 1
+    return (np.clip(x // TAMANO_TESELA, 0, maximo).astype(np.int64),
+            np.clip(y // TAMANO_TESELA, 0, maximo).astype(np.int64))
+
+def simplificar(coords, zoom):
+    """Índices de los puntos que caen en un píxel distinto del anterior (siempre el primero y el último)."""
+    x, y = pixeles(coords, zoom)
+    px, py = x.astype(np.int64), y.astype(np.int64)
+    cambia = np.ones(len(px), dtype=bool)
+    cambia[1:] = (px[1:] != px[:-1]) | (py[1:] != py[:-1])
+    cambia[-1] = True
+    return np.flatnonzero(cambia)
+
+def _tramos(mascara):
+    """(inicio, fin) de cada racha de True en la máscara."""
+    bordes = np.diff(np.concatenate([[0], mascara.astype(np.int8), [0]]))
+    return zip(np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1))
+
+# =========================================================
+# --- TESELAS DE UN RECORRIDO ---
+# =========================================================
+def teselas_recorrido(coords, segundos, foto):
+    """{"z/x/y": {"lineas": [[[lat, lon], ...], ...], "fotos": [[lat, lon, segundo], ...]}} de un recorrido."""
+    coords = np.round(np.asarray(coords, dtype=np.float64).reshape(-1, 2), 6)
+    segundos = np.asarray(segundos)
+    resultado = {}
+    for zoom in ZOOMS_TESELAS:
+        indices = simplificar(coords, zoom) if len(coords) else np.zeros(0, dtype=np.int64)
+        puntos = coords[indices]
+        tx, ty = teselas_de(puntos, zoom)
+        claves = tx * (2 ** zoom) + ty
+        for clave in np.unique(claves):
+            dentro = claves == clave
+            extendida = dentro.copy()
+            extendida[1:] |= dentro[:-1]
+            extendida[:-1] |= dentro[1:]
+            lineas = [puntos[a:b].tolist() for a, b in _tramos(extendida) if b - a >= 2]
+            if lineas:
+                resultado[f"{zoom}/{clave // (2 ** zoom)}/{clave % (2 ** zoom)}"] = {"lineas": lineas, "fotos": []}
+
+    n = min(len(coords), len(segundos), len(foto))
+    con_foto = np.flatnonzero(np.asarray(foto[:n], dtype=bool))
+    tx, ty = teselas_de(coords[con_foto], ZOOM_FOTOS)
+    for i, x, y in zip(con_foto, tx, ty):
+        tesela = resultado.setdefault(f"{ZOOM_FOTOS}/{x}/{y}", {"lineas": [], "fotos": []})
+        tesela["fotos"].append([coords[i, 0], coords[i, 1], int(segundos[i])])
+    return resultado
+
+# =========================================================
+# --- PIRÁMIDE EN DISCO (ACTUALIZACIÓN INCREMENTAL) ---
+# =========================================================
+def _leer_indice(dir_teselas):
+    try:
+        with open(os.path.join(dir_teselas, INDICE_TESELAS), encoding="utf-8") as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return indice if indice.get("version") == VERSION_TESELAS else None
+
+def actualizar_teselas(dir_teselas=DIR_TESELAS, base_dir_coords=BASE_DIR_COORDS, base_dir_img=BASE_DIR_IMG):
+    """Reescribe solo las teselas que tocan recorridos nuevos, modificados o borrados; devuelve cuántas escribió."""
+    indice = _leer_indice(dir_teselas)
+    if indice is None:
+        # Sin índice válido no se sabe qué teselas están vigentes: se empieza de cero
+        shutil.rmtree(dir_teselas, ignore_errors=True)
+        indice = {"version": VERSION_TESELAS, "recorridos": {}}
+    anteriores = indice["recorridos"]
+    dir_recorridos = os.path.join(dir_teselas, "recorridos")
+    actuales = {}
+    fragmentos = {}
+    afectadas = set()
+
+    if os.path.isdir(base_dir_coords):
+        for nombre in os.listdir(base_dir_coords):
+            if not os.path.isdir(os.path.join(base_dir_coords, nombre)):
+                continue
+            track = cargar_track(nombre, base_dir_coords)
+            if track is None:
+                continue
+            firma = firma_recorrido(nombre, base_dir_coords, base_dir_img)
+            entrada = anteriores.get(nombre)
+            if entrada and entrada["firma"] == firma and os.path.exists(os.path.join(dir_recorridos, f"{nombre}.json")):
+                actuales[nombre] = entrada
+                track.cerrar()
+                continue
+            segundos, coords = track.segundos, track.coords
+            track.cerrar()
+            nuevo = teselas_recorrido(coords, segundos, fotos_recorrido(nombre, segundos, base_dir_img))
+            escribir_atomico(os.path.join(dir_recorridos, f"{nombre}.json"), json.dumps(nuevo, separators=(",", ":")))
+            fragmentos[nombre] = nuevo
+            actuales[nombre] = {"firma": firma, "teselas": sorted(nuevo)}
+            afectadas |= set(nuevo) | set(entrada["teselas"] if entrada else [])
+
+    for nombre in set(anteriores) - set(actuales):
+        afectadas |= set(anteriores[nombre]["teselas"])
+        ruta = os.path.join(dir_recorridos, f"{nombre}.json")
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    def fragmento(nombre):
+        if nombre not in fragmentos:
+            with open(os.path.join(dir_recorridos, f"{nombre}.json"), encoding="utf-8") as f:
+                fragmentos[nombre] = json.load(f)
+        return fragmentos[nombre]
+
+    por_tesela = {}
+    for nombre, entrada in actuales.items():
+        for clave in afectadas.intersection(entrada["teselas"]):
+            por_tesela.setdefault(clave, []).append(nombre)
+
+    for clave in afectadas:
+        ruta = os.path.join(dir_teselas, f"{clave}.js")
+        nombres = sorted(por_tesela.get(clave, []))
+        if not nombres:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            continue
+        datos = {
+            "lineas": [{"r": nombre, "c": linea} for nombre in nombres for linea in fragmento(nombre)[clave]["lineas"]],
+            "fotos": [foto + [nombre] for nombre in nombres for foto in fragmento(nombre)[clave]["fotos"]],
+        }
+        # Se cargan con <script> (no fetch): funciona desde file:// sin permisos extra en QWebEngineView
+        escribir_atomico(ruta, f"cargarTesela({json.dumps(clave)}, {json.dumps(datos, separators=(',', ':'))});\n")
+
+    indice["recorridos"] = actuales
+    escribir_atomico(os.path.join(dir_teselas, INDICE_TESELAS), json.dumps(indice))
+    print(f"🧱 Teselas: {len(afectadas)} actualizadas ({len(actuales)} recorridos)")
+    return len(afectadas)
+
+# Dibuja en el mapa las teselas visibles del zoom de datos que corresponde; el tamaño del HTML no
+# depende de cuántos recorridos haya. Usa abrirVideo y ampliarImagen del mapa.
+TESELAS_JS = """
+function iniciarTeselas(mapa, opciones) {
+    var grupos = {};
+    opciones.zooms.forEach(function (z) { grupos[z] = L.layerGroup(); });
+    var pedidas = {};
+    var icono = L.AwesomeMarkers.icon({icon: "camera", prefix: "fa", markerColor: "blue", iconColor: "white"});
+
+    window.cargarTesela = function (clave, datos) {
+        var grupo = grupos[parseInt(clave.split("/")[0], 10)];
+        datos.lineas.forEach(function (linea) {
+            var video = "../vids/" + linea.r + "/video.webm";
+            L.polyline(linea.c, {color: "blue", weight: 4, opacity: 0.8})
+                .bindPopup('<a href="#" onclick="abrirVideo(\\'' + video + '\\')">Ver video</a>')
+                .addTo(grupo);
+        });
+        datos.fotos.forEach(function (foto) {
+            var src = "../Img/" + foto[3] + "/" + foto[2] + ".webp";
+            L.marker([foto[0], foto[1]], {icon: icono})
+                .bindPopup("<img src='" + src + "' width='200' style='cursor:pointer;' " +
+                           "onclick=\\"ampliarImagen('" + src + "')\\">", {maxWidth: 220})
+                .addTo(grupo);
+        });
+    };
+
+    function zoomDatos(zoom) {
+        var elegido = opciones.zooms[0];
+        opciones.zooms.forEach(function (z) { if (z <= zoom) { elegido = z; } });
+        return elegido;
+    }
+
+    function tesela(latlng, z) {
+        var n = Math.pow(2, z);
+        var lat = Math.max(Math.min(latlng.lat, 85.05112878), -85.05112878) * Math.PI / 180;
+        var x = Math.floor((latlng.lng + 180) / 360 * n);
+        var y = Math.floor((1 - Math.log(Math.tan(lat) + 1 / Math.cos(lat)) / Math.PI) / 2 * n);
+        return {x: Math.min(Math.max(x, 0), n - 1), y: Math.min(Math.max(y, 0), n - 1)};
+    }
+
+    function actualizar() {
+        var z = zoomDatos(mapa.getZoom());
+        opciones.zooms.forEach(function (otro) {
+            if (otro === z) { mapa.addLayer(grupos[otro]); } else { mapa.removeLayer(grupos[otro]); }
+        });
+        var limites = mapa.getBounds();
+        var a = tesela(limites.getNorthWest(), z), b = tesela(limites.getSouthEast(), z);
+        // Muy alejado: demasiadas teselas, hay que acercarse
+        if ((b.x - a.x + 1) * (b.y - a.y + 1) > opciones.max_teselas) { return; }
+        for (var x = a.x; x <= b.x; x++) {
+            for (var y = a.y; y <= b.y; y++) {
+                var clave = z + "/" + x + "/" + y;
+                if (pedidas[clave]) { continue; }
+                pedidas[clave] = true;
+                var script = document.createElement("script");
+                script.src = opciones.ruta + "/" + clave + ".js";
+                // Tesela sin datos: no existe el archivo
+                script.onerror = function () { this.remove(); };
+                document.head.appendChild(script);
+            }
+        }
+    }
+
+    mapa.on("moveend", actualizar);
+    actualizar();
+}
+"""
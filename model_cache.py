@@ -0,0 +1,41 @@
+# model_cache.py
+import os
+import threading
+
+MODEL_PATH = './pretrained/koniq_pretrained.pkl'
+
+# Modelos HyperIQA ya cargados en este proceso, por (ruta absoluta, dispositivo)
+_modelos = {}
+_lock = threading.Lock()
+
+# =========================================================
+# --- REGISTRO DE MODELOS RESIDENTES ---
+# =========================================================
+def _clave(model_path, device, opciones):
+    return os.path.abspath(model_path), str(device) if device is not None else "auto", tuple(sorted(opciones.items()))
+
+def obtener_modelo_hyperiqa(model_path=MODEL_PATH, device=None, **opciones):
+    """Devuelve (model_hyper, transforms, device) cargando el checkpoint solo la primera vez por proceso."""
+    clave = _clave(model_path, device, opciones)
+    with _lock:
+        if clave not in _modelos:
+            from frame_selector import load_hyperiqa_model
+            _modelos[clave] = load_hyperiqa_model(model_path, device=device, **opciones)
+        return _modelos[clave]
+
+def precargar_modelo_en_segundo_plano(model_path=MODEL_PATH, device=None, **opciones):
+    """Carga el modelo en un hilo daemon para que la primera extracción no bloquee la interfaz."""
+    def _precargar():
+        try:
+            obtener_modelo_hyperiqa(model_path, device, **opciones)
+        except Exception as e:
+            print(f"⚠️ No se pudo precargar HyperIQA: {e}")
+
+    hilo = threading.Thread(target=_precargar, daemon=True)
+    hilo.start()
+    return hilo
+
+def liberar_modelos():
+    """Descarta los modelos residentes (por ejemplo, tras reemplazar el checkpoint)."""
+    with _lock:
+        _modelos.clear()
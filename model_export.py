@@ -0,0 +1,109 @@
+# model_export.py
+import os
+import copy
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+import models
+from model_cache import MODEL_PATH
+
+# Sufijo del artefacto TorchScript que se guarda junto al checkpoint .pkl
+SUFIJO_OPTIMIZADO = ".optimizado.pt"
+
+# =========================================================
+# --- OPTIMIZACIONES DE INFERENCIA ---
+# =========================================================
+def fusionar_batchnorm(model):
+    """Pliega cada BatchNorm2d en la Conv2d que la precede (Bottleneck, stem y downsample) y la reemplaza por Identity."""
+    model.eval()
+    for modulo in list(model.modules()):
+        if isinstance(modulo, (models.Bottleneck, models.ResNetBackbone)):
+            for conv_name, bn_name in (("conv1", "bn1"), ("conv2", "bn2"), ("conv3", "bn3")):
+                conv = getattr(modulo, conv_name, None)
+                bn = getattr(modulo, bn_name, None)
+                if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                    setattr(modulo, conv_name, fuse_conv_bn_eval(conv, bn))
+                    setattr(modulo, bn_name, nn.Identity())
+        elif isinstance(modulo, nn.Sequential) and len(modulo) == 2 \
+                and isinstance(modulo[0], nn.Conv2d) and isinstance(modulo[1], nn.BatchNorm2d):
+            modulo[0] = fuse_conv_bn_eval(modulo[0], modulo[1])
+            modulo[1] = nn.Identity()
+    return model
+
+def construir_modelo_optimizado(model_hyper, device):
+    """Envuelve una copia de HyperNet + TargetNet, pliega BatchNorm y pasa los pesos a channels_last."""
+    scorer = models.HyperIQAScorer(copy.deepcopy(model_hyper)).to(device).eval()
+    fusionar_batchnorm(scorer)
+    for param in scorer.parameters():
+        param.requires_grad = False
+    return scorer.to(memory_format=torch.channels_last)
+
+def ruta_artefacto(model_path, sufijo=SUFIJO_OPTIMIZADO):
+    """Ruta de un artefacto asociado a un checkpoint (p. ej. koniq_pretrained.optimizado.pt)."""
+    return os.path.splitext(model_path)[0] + sufijo
+
+def _firma_checkpoint(model_path, device):
+    """Identifica checkpoint + versión de torch + dispositivo para invalidar artefactos obsoletos."""
+    stat = os.stat(model_path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}:{torch.__version__}:{torch.device(device).type}"
+
+def trazar_y_guardar(scorer, artefacto, model_path, device, tamano_lote=2):
+    """Traza un scorer con TorchScript, lo congela y lo guarda firmado con el checkpoint de origen."""
+    ejemplo = torch.randn(tamano_lote, 3, 224, 224, device=device).contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        trazado = torch.jit.trace(scorer, ejemplo, check_trace=False)
+        trazado = torch.jit.freeze(trazado)
+    torch.jit.save(trazado, artefacto, _extra_files={"firma": _firma_checkpoint(model_path, device)})
+    return trazado
+
+def cargar_artefacto(artefacto, model_path, device):
+    """Carga un artefacto TorchScript si existe y su firma coincide con el checkpoint; si no, devuelve None."""
+    if not os.path.exists(artefacto):
+        return None
+    extra = {"firma": ""}
+    try:
+        trazado = torch.jit.load(artefacto, map_location=device, _extra_files=extra)
+    except Exception as e:
+        print(f"⚠️ Artefacto inválido, se regenera: {e}")
+        return None
+    firma = extra["firma"].decode() if isinstance(extra["firma"], bytes) else extra["firma"]
+    return trazado if firma == _firma_checkpoint(model_path, device) else None
+
+def exportar_torchscript(model_path, device):
+    """Construye el modelo optimizado, lo traza con TorchScript y lo guarda junto al checkpoint."""
+    from frame_selector import construir_hypernet
+    scorer = construir_modelo_optimizado(construir_hypernet(model_path, device), device)
+    return trazar_y_guardar(scorer, ruta_artefacto(model_path), model_path, device)
+
+def cargar_modelo_optimizado(model_path, device, compilar=False):
+    """Devuelve el modelo de inferencia optimizado, reutilizando el artefacto en disco si sigue vigente."""
+    if compilar:
+        from frame_selector import construir_hypernet
+        scorer = construir_modelo_optimizado(construir_hypernet(model_path, device), device)
+        # Sin mode="reduce-overhead": sus CUDA graphs exigen formas fijas y el último lote de cada ventana es menor
+        return torch.compile(scorer)
+
+    trazado = cargar_artefacto(ruta_artefacto(model_path), model_path, device)
+    if trazado is not None:
+        return trazado
+    return exportar_torchscript(model_path, device)
+
+# =========================================================
+# --- VERIFICACIÓN DE PARIDAD ---
+# =========================================================
+def verificar_paridad(model_path=MODEL_PATH, device=None, n=4, tolerancia=1e-2, semilla=0):
+    """Compara los scores eager y optimizados sobre n entradas aleatorias y devuelve (ok, diferencia_maxima)."""
+    from frame_selector import load_hyperiqa_model, inferir_scores
+
+    model_hyper, _, device = load_hyperiqa_model(model_path, device=device)
+    optimizado, _, _ = load_hyperiqa_model(model_path, device=device, optimizado=True)
+    generador = torch.Generator().manual_seed(semilla)
+    imgs = torch.randn(n, 3, 224, 224, generator=generador).to(device)
+    eager = inferir_scores(model_hyper, imgs)
+    rapido = inferir_scores(optimizado, imgs)
+    diferencia = float((eager - rapido).abs().max())
+    return diferencia <= tolerancia, diferencia
+
+if __name__ == "__main__":
+    ok, diferencia = verificar_paridad()
+    print(f"{'✅' if ok else '❌'} Paridad eager vs optimizado: diferencia máxima {diferencia:.6f}")
@@ -24,12 +24,14 @@ class HyperNet(nn.Module):
         target_in_size: input vector size for target network.
         target_fc(i)_size: fully connection layer size of target network.
         feature_size: input feature map width/height for hyper network.
+        pretrained_backbone: load ImageNet weights into the ResNet-50 backbone. Set to False when a
+            full HyperIQA checkpoint is loaded afterwards (avoids a redundant download/load).
 
     Note:
         For size match, input args must satisfy: 'target_fc(i)_size * target_fc(i+1)_size' is divisible by 'feature_size ^ 2'.
 
     """
-    def __init__(self, lda_out_channels, hyper_in_channels, target_in_size, target_fc1_size, target_fc2_size, target_fc3_size, target_fc4_size, feature_size):
+    def __init__(self, lda_out_channels, hyper_in_channels, target_in_size, target_fc1_size, target_fc2_size, target_fc3_size, target_fc4_size, feature_size, pretrained_backbone=True):
         super(HyperNet, self).__init__()
 
         self.hyperInChn = hyper_in_channels
@@ -40,7 +42,7 @@ class HyperNet(nn.Module):
         self.f4 = target_fc4_size
         self.feature_size = feature_size
 
-        self.res = resnet50_backbone(lda_out_channels, target_in_size, pretrained=True)
+        self.res = resnet50_backbone(lda_out_channels, target_in_size, pretrained=pretrained_backbone)
 
         self.pool = nn.AdaptiveAvgPool2d((1, 1))
 
@@ -76,31 +78,32 @@ class HyperNet(nn.Module):
                 nn.init.kaiming_normal_(self._modules[m_name].weight.data)
 
     def forward(self, img):
+        # reshape instead of view so that channels_last inputs are also supported
         feature_size = self.feature_size
 
         res_out = self.res(img)
 
         # input vector for target net
-        target_in_vec = res_out['target_in_vec'].view(-1, self.target_in_size, 1, 1)
+        target_in_vec = res_out['target_in_vec'].reshape(-1, self.target_in_size, 1, 1)
 
         # input features for hyper net
-        hyper_in_feat = self.conv1(res_out['hyper_in_feat']).view(-1, self.hyperInChn, feature_size, feature_size)
+        hyper_in_feat = self.conv1(res_out['hyper_in_feat']).reshape(-1, self.hyperInChn, feature_size, feature_size)
 
         # generating target net weights & biases
-        target_fc1w = self.fc1w_conv(hyper_in_feat).view(-1, self.f1, self.target_in_size, 1, 1)
-        target_fc1b = self.fc1b_fc(self.pool(hyper_in_feat).squeeze()).view(-1, self.f1)
+        target_fc1w = self.fc1w_conv(hyper_in_feat).reshape(-1, self.f1, self.target_in_size, 1, 1)
+        target_fc1b = self.fc1b_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, self.f1)
 
-        target_fc2w = self.fc2w_conv(hyper_in_feat).view(-1, self.f2, self.f1, 1, 1)
-        target_fc2b = self.fc2b_fc(self.pool(hyper_in_feat).squeeze()).view(-1, self.f2)
+        target_fc2w = self.fc2w_conv(hyper_in_feat).reshape(-1, self.f2, self.f1, 1, 1)
+        target_fc2b = self.fc2b_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, self.f2)
 
-        target_fc3w = self.fc3w_conv(hyper_in_feat).view(-1, self.f3, self.f2, 1, 1)
-        target_fc3b = self.fc3b_fc(self.pool(hyper_in_feat).squeeze()).view(-1, self.f3)
+        target_fc3w = self.fc3w_conv(hyper_in_feat).reshape(-1, self.f3, self.f2, 1, 1)
+        target_fc3b = self.fc3b_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, self.f3)
 
-        target_fc4w = self.fc4w_conv(hyper_in_feat).view(-1, self.f4, self.f3, 1, 1)
-        target_fc4b = self.fc4b_fc(self.pool(hyper_in_feat).squeeze()).view(-1, self.f4)
+        target_fc4w = self.fc4w_conv(hyper_in_feat).reshape(-1, self.f4, self.f3, 1, 1)
+        target_fc4b = self.fc4b_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, self.f4)
 
-        target_fc5w = self.fc5w_fc(self.pool(hyper_in_feat).squeeze()).view(-1, 1, self.f4, 1, 1)
-        target_fc5b = self.fc5b_fc(self.pool(hyper_in_feat).squeeze()).view(-1, 1)
+        target_fc5w = self.fc5w_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, 1, self.f4, 1, 1)
+        target_fc5b = self.fc5b_fc(self.pool(hyper_in_feat).squeeze()).reshape(-1, 1)
 
         out = {}
         out['target_in_vec'] = target_in_vec
@@ -153,6 +156,21 @@ class TargetNet(nn.Module):
         return q
 
 
+class HyperIQAScorer(nn.Module):
+    """
+    HyperNet + TargetNet in a single module that maps a batch of images to a batch of quality scores.
+
+    Used for inference-optimized exports (BN folding, channels_last, TorchScript tracing).
+    """
+    def __init__(self, hyper_net):
+        super(HyperIQAScorer, self).__init__()
+        self.hyper_net = hyper_net
+
+    def forward(self, img):
+        paras = self.hyper_net(img)
+        return TargetNet(paras)(paras['target_in_vec']).reshape(-1)
+
+
 class TargetFC(nn.Module):
     """
     Fully connection operations for target net
@@ -293,13 +311,13 @@ class ResNetBackbone(nn.Module):
         x = self.layer1(x)
 
         # the same effect as lda operation in the paper, but save much more memory
-        lda_1 = self.lda1_fc(self.lda1_pool(x).view(x.size(0), -1))
+        lda_1 = self.lda1_fc(self.lda1_pool(x).reshape(x.size(0), -1))
         x = self.layer2(x)
-        lda_2 = self.lda2_fc(self.lda2_pool(x).view(x.size(0), -1))
+        lda_2 = self.lda2_fc(self.lda2_pool(x).reshape(x.size(0), -1))
         x = self.layer3(x)
-        lda_3 = self.lda3_fc(self.lda3_pool(x).view(x.size(0), -1))
+        lda_3 = self.lda3_fc(self.lda3_pool(x).reshape(x.size(0), -1))
         x = self.layer4(x)
-        lda_4 = self.lda4_fc(self.lda4_pool(x).view(x.size(0), -1))
+        lda_4 = self.lda4_fc(self.lda4_pool(x).reshape(x.size(0), -1))
 
         vec = torch.cat((lda_1, lda_2, lda_3, lda_4), 1)
 
@@ -0,0 +1,68 @@
+# quality_metrics.py
+import cv2
+import numpy as np
+
+_NIVELES = np.arange(256, dtype=np.int64)
+
+# =========================================================
+# --- MÉTRICAS DE CALIDAD VECTORIZADAS SOBRE PILAS DE FRAMES ---
+# =========================================================
+def apilar_grises(frames, destino=None):
+    """Convierte frames BGR en una pila (N, H, W) uint8, reutilizando destino si tiene el tamaño adecuado."""
+    h, w = frames[0].shape[:2]
+    if destino is None or destino.shape != (len(frames), h, w):
+        destino = np.empty((len(frames), h, w), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=destino[i])
+    return destino
+
+def histogramas(grises):
+    """Histograma de 256 niveles de cada imagen de la pila: array (N, 256) int64 construido con np.bincount."""
+    hist = np.empty((grises.shape[0], 256), dtype=np.int64)
+    for i, gray in enumerate(grises):
+        hist[i] = np.bincount(gray.ravel(), minlength=256)
+    return hist
+
+def nitidez_lote(grises):
+    """Varianza del Laplaciano (como cv2.Laplacian con ksize=1) de cada imagen de una pila (N, H, W) uint8."""
+    p = np.pad(grises, ((0, 0), (1, 1), (1, 1)), mode='reflect').astype(np.int16)
+    lap = p[:, :-2, 1:-1] + p[:, 2:, 1:-1] + p[:, 1:-1, :-2] + p[:, 1:-1, 2:] - 4 * p[:, 1:-1, 1:-1]
+    n = lap.shape[1] * lap.shape[2]
+    suma = lap.sum(axis=(1, 2), dtype=np.int64)
+    suma_cuadrados = np.einsum('nij,nij->n', lap, lap, dtype=np.int64)
+    return (suma_cuadrados - suma.astype(np.float64) ** 2 / n) / n
+
+def contraste_lote(hist):
+    """Contraste RMS (desviación estándar poblacional) de cada imagen a partir de sus histogramas."""
+    n = hist.sum(axis=1)
+    suma = hist @ _NIVELES
+    suma_cuadrados = hist @ (_NIVELES ** 2)
+    varianza = (suma_cuadrados - suma.astype(np.float64) ** 2 / n) / n
+    return np.sqrt(np.maximum(varianza, 0.0))
+
+def entropia_lote(hist):
+    """Entropía de Shannon en bits (como skimage.measure.shannon_entropy) de cada imagen a partir de sus histogramas."""
+    p = hist / hist.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terminos = np.where(p > 0, p * np.log2(p), 0.0)
+    return -terminos.sum(axis=1)
+
+def calcular_metricas_lote(grises):
+    """Devuelve (nitidez, contraste, entropia) como arrays (N,) para una pila (N, H, W) uint8."""
+    hist = histogramas(grises)
+    return nitidez_lote(grises), contraste_lote(hist), entropia_lote(hist)
+
+def verificar_equivalencia(grises, tolerancia=1e-6):
+    """Compara las métricas vectorizadas con las funciones por frame; devuelve la máxima diferencia relativa."""
+    from frame_selector import calcular_nitidez, calcular_contraste, calcular_entropia
+
+    lote = np.stack(calcular_metricas_lote(grises), axis=1)
+    referencia = np.array([[calcular_nitidez(g), calcular_contraste(g), calcular_entropia(g)] for g in grises])
+    diferencia = float(np.max(np.abs(lote - referencia) / np.maximum(np.abs(referencia), 1.0)))
+    return diferencia <= tolerancia, diferencia
+
+if __name__ == "__main__":
+    generador = np.random.default_rng(0)
+    pila = generador.integers(0, 256, size=(8, 360, 640), dtype=np.uint8)
+    ok, diferencia = verificar_equivalencia(pila)
+    print(f"{'✅' if ok else '❌'} Métricas vectorizadas vs por frame: diferencia relativa máxima {diferencia:.2e}")
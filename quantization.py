@@ -0,0 +1,142 @@
+# quantization.py
+import os
+import copy
+import time
+import platform
+import cv2
+import numpy as np
+import torch
+import models
+from model_cache import MODEL_PATH
+from model_export import ruta_artefacto, trazar_y_guardar, cargar_artefacto
+
+# Sufijo del artefacto INT8 que se guarda junto al checkpoint .pkl
+SUFIJO_INT8 = ".int8.pt"
+
+# Capas Linear de la hyper-red (generan los sesgos/pesos de TargetNet): cuantización dinámica
+CAPAS_LINEAR_HYPER = ('fc1b_fc', 'fc2b_fc', 'fc3b_fc', 'fc4b_fc', 'fc5w_fc', 'fc5b_fc')
+
+# =========================================================
+# --- FRAMES DE CALIBRACIÓN DESDE NUESTROS RECORRIDOS ---
+# =========================================================
+def motor_cuantizado():
+    """Selecciona el backend INT8 según la CPU (qnnpack en ARM, x86/fbgemm en el resto)."""
+    return "qnnpack" if platform.machine().lower() in ("arm64", "aarch64") else "x86"
+
+def muestrear_frames_de_recorridos(base_dir_vids="Vids", n_frames=64, desfase=0.5):
+    """Toma n_frames repartidos uniformemente entre todos los Vids/recorridoN/video.webm."""
+    videos = []
+    if os.path.isdir(base_dir_vids):
+        for recorrido in sorted(os.listdir(base_dir_vids)):
+            video_path = os.path.join(base_dir_vids, recorrido, "video.webm")
+            if os.path.isfile(video_path):
+                videos.append(video_path)
+    if not videos:
+        return []
+
+    frames = []
+    por_video = max(1, n_frames // len(videos))
+    for video_path in videos:
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        paso = total / por_video if total > 0 else 0
+        for i in range(por_video):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int((i + desfase) * paso))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames[:n_frames]
+
+def _tensores(frames, transforms, batch_size):
+    """Convierte frames BGR en lotes de tensores preprocesados para HyperIQA (copias, no el búfer reutilizable)."""
+    from frame_selector import preprocesar_lote
+    for inicio in range(0, len(frames), batch_size):
+        yield preprocesar_lote(frames[inicio:inicio + batch_size], transforms)[0].clone()
+
+# =========================================================
+# --- CUANTIZACIÓN ---
+# =========================================================
+def cuantizar_hypernet(model_hyper, lotes_calibracion):
+    """Devuelve una copia INT8 de HyperNet para CPU."""
+    from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic, default_dynamic_qconfig
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    motor = motor_cuantizado()
+    torch.backends.quantized.engine = motor
+    model = copy.deepcopy(model_hyper).cpu().eval()
+
+    ejemplo = (torch.randn(1, 3, 224, 224),)
+    preparado = prepare_fx(model.res, get_default_qconfig_mapping(motor), ejemplo)
+    with torch.no_grad():
+        for lote in lotes_calibracion:
+            preparado(lote)
+    model.res = convert_fx(preparado)
+
+    quantize_dynamic(model, {nombre: default_dynamic_qconfig for nombre in CAPAS_LINEAR_HYPER},
+                     dtype=torch.qint8, inplace=True)
+    return model
+
+def calibrar_y_exportar(model_path, base_dir_vids="Vids", n_frames=64, batch_size=16):
+    """Calibra con frames de nuestros recorridos, cuantiza y guarda el artefacto INT8 junto al checkpoint."""
+    from frame_selector import load_hyperiqa_model
+
+    model_hyper, transforms, _ = load_hyperiqa_model(model_path, device=torch.device("cpu"))
+    frames = muestrear_frames_de_recorridos(base_dir_vids, n_frames=n_frames, desfase=0.25)
+    if not frames:
+        raise Exception(f"No hay videos en {base_dir_vids} para calibrar el modelo INT8.")
+    cuantizado = cuantizar_hypernet(model_hyper, _tensores(frames, transforms, batch_size))
+    scorer = models.HyperIQAScorer(cuantizado).eval()
+    return trazar_y_guardar(scorer, ruta_artefacto(model_path, SUFIJO_INT8), model_path, torch.device("cpu"))
+
+def cargar_modelo_cuantizado(model_path, base_dir_vids="Vids"):
+    """Devuelve el modelo INT8 (CPU), calibrándolo con nuestros recorridos si no hay artefacto vigente."""
+    torch.backends.quantized.engine = motor_cuantizado()
+    cpu = torch.device("cpu")
+    trazado = cargar_artefacto(ruta_artefacto(model_path, SUFIJO_INT8), model_path, cpu)
+    if trazado is not None:
+        return trazado
+    return calibrar_y_exportar(model_path, base_dir_vids=base_dir_vids)
+
+# =========================================================
+# --- REPORTE FP32 VS INT8 ---
+# =========================================================
+def _medir(model_hyper, lotes):
+    """Devuelve (scores, frames por segundo) de un modelo sobre lotes ya preprocesados."""
+    from frame_selector import inferir_scores
+    scores = []
+    inicio = time.perf_counter()
+    for lote in lotes:
+        scores.extend(inferir_scores(model_hyper, lote).tolist())
+    segundos = time.perf_counter() - inicio
+    return np.array(scores), (len(scores) / segundos if segundos > 0 else 0.0)
+
+def reporte_cuantizacion(model_path=MODEL_PATH, base_dir_vids="Vids", n_frames=64,
+                         batch_size=16):
+    """Compara FP32 e INT8 (correlación de rangos, error medio y throughput) sobre frames de nuestros recorridos."""
+    from scipy.stats import spearmanr, kendalltau
+    from frame_selector import load_hyperiqa_model
+
+    cpu = torch.device("cpu")
+    fp32, transforms, _ = load_hyperiqa_model(model_path, device=cpu)
+    int8, _, _ = load_hyperiqa_model(model_path, device=cpu, cuantizado=True)
+    frames = muestrear_frames_de_recorridos(base_dir_vids, n_frames=n_frames, desfase=0.75)
+    if not frames:
+        raise Exception(f"No hay videos en {base_dir_vids} para evaluar el modelo INT8.")
+    lotes = list(_tensores(frames, transforms, batch_size))
+
+    scores_fp32, fps_fp32 = _medir(fp32, lotes)
+    scores_int8, fps_int8 = _medir(int8, lotes)
+    return {
+        "frames": len(scores_fp32),
+        "spearman": float(spearmanr(scores_fp32, scores_int8)[0]),
+        "kendall": float(kendalltau(scores_fp32, scores_int8)[0]),
+        "error_absoluto_medio": float(np.mean(np.abs(scores_fp32 - scores_int8))),
+        "frames_por_segundo_fp32": round(fps_fp32, 2),
+        "frames_por_segundo_int8": round(fps_int8, 2),
+        "aceleracion": round(fps_int8 / fps_fp32, 2) if fps_fp32 > 0 else 0.0,
+    }
+
+if __name__ == "__main__":
+    for clave, valor in reporte_cuantizacion().items():
+        print(f"{clave}: {valor}")
@@ -0,0 +1,68 @@
+# recorridos.py
+import os
+import shutil
+
+BASE_DIR_COORDS = "Coords"
+BASE_DIR_VIDS = "Vids"
+
+# =========================================================
+# --- GESTIÓN DE CARPETAS DE RECORRIDOS (SIN QT) ---
+# =========================================================
+def numero_recorrido(nombre):
+    """Devuelve N para 'recorridoN' (0 si el nombre no sigue el patrón)."""
+    numero = nombre.replace("recorrido", "")
+    return int(numero) if numero.isdigit() else 0
+
+def listar_recorridos(base_dir_vids=BASE_DIR_VIDS):
+    """Lista las subcarpetas recorridoN de Vids/ ordenadas por número."""
+    if not os.path.isdir(base_dir_vids):
+        return []
+    recorridos = [d for d in os.listdir(base_dir_vids) if os.path.isdir(os.path.join(base_dir_vids, d))]
+    return sorted(recorridos, key=numero_recorrido)
+
+def ultimo_recorrido(base_dir_vids=BASE_DIR_VIDS):
+    """Devuelve el recorrido con el número más alto, o "" si no hay ninguno."""
+    recorridos = listar_recorridos(base_dir_vids)
+    return recorridos[-1] if recorridos else ""
+
+def importar_recorrido(video, coords, base_dir_coords=BASE_DIR_COORDS, base_dir_vids=BASE_DIR_VIDS):
+    """Copia el video y las coordenadas a la siguiente carpeta recorridoN libre y devuelve su nombre."""
+    n = 1
+    while os.path.exists(os.path.join(base_dir_coords, f"recorrido{n}")):
+        n += 1
+    subfolder = f"recorrido{n}"
+
+    coords_dest = os.path.join(base_dir_coords, subfolder)
+    vids_dest = os.path.join(base_dir_vids, subfolder)
+    os.makedirs(coords_dest, exist_ok=True)
+    os.makedirs(vids_dest, exist_ok=True)
+
+    shutil.copy(coords, os.path.join(coords_dest, "cordenadas.txt"))
+    shutil.copy(video, os.path.join(vids_dest, "video.webm"))
+    return subfolder
+
+def copiar_frames_a_img(img_folder, img_dest):
+    """Reemplaza el contenido de Img/recorridoX con los .webp de img_folder."""
+    if os.path.exists(img_dest):
+        for f in os.listdir(img_dest):
+            os.remove(os.path.join(img_dest, f))
+    else:
+        os.makedirs(img_dest, exist_ok=True)
+    for f in os.listdir(img_folder):
+        if f.lower().endswith(".webp"):
+            shutil.copy(os.path.join(img_folder, f), os.path.join(img_dest, f))
+
+# =========================================================
+# --- COORDENADAS GPS ---
+# =========================================================
+def leer_coordenadas(recorrido, base_dir_coords=BASE_DIR_COORDS):
+    """Devuelve (puntos, segundos) del recorrido desde su cordenadas.npz (creado desde el .txt o el .json si falta)."""
+    from track_store import cargar_track
+
+    track = cargar_track(recorrido, base_dir_coords)
+    if track is None:
+        return [], []
+    try:
+        return track.coords.tolist(), track.segundos.tolist()
+    finally:
+        track.cerrar()
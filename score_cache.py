@@ -0,0 +1,120 @@
+# score_cache.py
+import os
+import json
+import hashlib
+import numpy as np
+from escritura_atomica import reemplazo_atomico, escribir_atomico
+
+# Carpeta (junto a Vids/, frameRep/...) con un almacén de scores por video y versión de modelo
+BASE_DIR_SCORES = "Scores"
+
+# Columnas del almacén; NaN = todavía no calculado
+COLUMNAS = ("nitidez", "contraste", "entropia", "hyperiqa")
+COLUMNA_HYPERIQA = COLUMNAS.index("hyperiqa")
+
+class ScoresIncompletos(Exception):
+    """Falta el score HyperIQA de algún frame que no está decodificado (ver CacheScores.completar_hyperiqa)."""
+
+# =========================================================
+# --- CLAVES: CONTENIDO DEL VIDEO Y VERSIÓN DEL MODELO ---
+# =========================================================
+def huella_video(video_path, bloque=1 << 22):
+    """Hash BLAKE2 del contenido del video: la caché sobrevive a renombrar o copiar el recorrido."""
+    h = hashlib.blake2b(digest_size=12)
+    with open(video_path, "rb") as f:
+        while True:
+            datos = f.read(bloque)
+            if not datos:
+                break
+            h.update(datos)
+    return h.hexdigest()
+
+def version_modelo(model_path, **opciones):
+    """Identifica el checkpoint (tamaño y fecha) y las opciones de inferencia que cambian los scores."""
+    st = os.stat(model_path)
+    clave = f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}:{sorted(opciones.items())}"
+    return hashlib.blake2b(clave.encode("utf-8"), digest_size=6).hexdigest()
+
+# =========================================================
+# --- ALMACÉN COLUMNAR EN DISCO ---
+# =========================================================
+class CacheScores:
+    """Métricas OpenCV y score HyperIQA por índice de frame, en un .npy mapeado en memoria."""
+    def __init__(self, video_path, version, base_dir=BASE_DIR_SCORES, frames_estimados=0):
+        os.makedirs(base_dir, exist_ok=True)
+        prefijo = os.path.join(base_dir, f"{huella_video(video_path)}.{version}")
+        self.ruta = prefijo + ".npy"
+        self.ruta_info = prefijo + ".json"
+        if os.path.exists(self.ruta):
+            self.datos = np.lib.format.open_memmap(self.ruta, mode="r+")
+        else:
+            self.datos = self._crear(self.ruta, max(4096, frames_estimados))
+        try:
+            with open(self.ruta_info, encoding="utf-8") as f:
+                self.info = json.load(f)
+        except (OSError, ValueError):
+            self.info = {"frames": None}
+
+    @staticmethod
+    def _crear(ruta, filas):
+        datos = np.lib.format.open_memmap(ruta, mode="w+", dtype=np.float64, shape=(filas, len(COLUMNAS)))
+        datos[:] = np.nan
+        return datos
+
+    def _asegurar(self, filas):
+        """Agranda el almacén (duplicando) si un índice supera las filas actuales."""
+        if filas <= len(self.datos):
+            return
+        with reemplazo_atomico(self.ruta) as temporal:
+            nuevos = self._crear(temporal, max(filas, 2 * len(self.datos)))
+            nuevos[:len(self.datos)] = self.datos
+            nuevos.flush()
+            del nuevos
+            self.datos.flush()
+            self.datos = None
+        self.datos = np.lib.format.open_memmap(self.ruta, mode="r+")
+
+    def _leer(self, indices, columnas):
+        indices = np.asarray(indices, dtype=np.int64)
+        valores = np.full((len(indices),) + self.datos[:0, columnas].shape[1:], np.nan)
+        dentro = indices < len(self.datos)
+        valores[dentro] = self.datos[indices[dentro], columnas]
+        return valores
+
+    @property
+    def frames(self):
+        """Frames del video si ya se leyó completo alguna vez; None si no se sabe."""
+        return self.info["frames"]
+
+    def registrar_fin(self, frames):
+        self.info["frames"] = int(frames)
+        escribir_atomico(self.ruta_info, json.dumps(self.info))
+
+    def guardar_metricas(self, indices, metricas):
+        """Guarda las métricas (N, 3) de los frames indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        self._asegurar(int(indices.max()) + 1)
+        self.datos[indices, :COLUMNA_HYPERIQA] = metricas
+
+    def metricas(self, indices):
+        return self._leer(indices, slice(0, COLUMNA_HYPERIQA))
+
+    def tiene_metricas(self, indices):
+        return not np.isnan(self.metricas(indices)).any()
+
+    def completar_hyperiqa(self, candidatos, evaluar):
+        """Devuelve el score HyperIQA de los candidatos (indice, frame, metricas), evaluando solo los que faltan."""
+        indices = np.array([c[0] for c in candidatos], dtype=np.int64)
+        scores = self._leer(indices, COLUMNA_HYPERIQA)
+        faltan = np.flatnonzero(np.isnan(scores))
+        if len(faltan):
+            frames = [candidatos[i][1] for i in faltan]
+            if any(frame is None for frame in frames):
+                raise ScoresIncompletos(f"{len(faltan)} frames sin score HyperIQA")
+            scores[faltan] = evaluar(frames)
+            self._asegurar(int(indices[faltan].max()) + 1)
+            self.datos[indices[faltan], COLUMNA_HYPERIQA] = scores[faltan]
+        return scores
+
+    def cerrar(self):
+        self.datos.flush()
@@ -0,0 +1,154 @@
+# scoring.py
+import math
+import bisect
+import itertools
+
+# Pesos originales de la puntuación compuesta
+PESOS_POR_DEFECTO = {"nitidez": 0.3, "contraste": 0.2, "entropia": 0.2, "hyperiqa": 0.3}
+METRICAS_BARATAS = ("nitidez", "contraste", "entropia")
+
+# Los scores de HyperIQA (KonIQ) están en la escala MOS 0-100
+MAX_HYPERIQA = 100.0
+
+# =========================================================
+# --- NORMALIZACIÓN POR RECORRIDO ---
+# =========================================================
+class NormalizadorNulo:
+    """Deja los valores en su escala original (comportamiento histórico)."""
+    def observar(self, valor):
+        pass
+
+    def transformar(self, valor):
+        return valor
+
+    def cota(self, maximo):
+        return maximo
+
+class NormalizadorZ:
+    """z-score con media y varianza acumuladas (Welford) sobre todo lo observado en el recorrido."""
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def observar(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+
+    def transformar(self, valor):
+        if self.n < 2 or self.m2 <= 0:
+            return 0.0
+        return (valor - self.media) / math.sqrt(self.m2 / self.n)
+
+    def cota(self, maximo):
+        # Sin estadísticas aún no hay cota útil: no se descarta nada
+        return self.transformar(maximo) if self.n >= 2 else math.inf
+
+class NormalizadorRango:
+    """Percentil (0-1] del valor entre los valores observados en el recorrido, con memoria acotada."""
+    def __init__(self, max_bins=128):
+        self.max_bins = max_bins
+        self.centros = []
+        self.cuentas = []
+        self.n = 0
+
+    def observar(self, valor):
+        self.n += 1
+        i = bisect.bisect_left(self.centros, valor)
+        if i < len(self.centros) and self.centros[i] == valor:
+            self.cuentas[i] += 1
+            return
+        self.centros.insert(i, valor)
+        self.cuentas.insert(i, 1)
+        if len(self.centros) > self.max_bins:
+            j = min(range(len(self.centros) - 1), key=lambda k: self.centros[k + 1] - self.centros[k])
+            total = self.cuentas[j] + self.cuentas[j + 1]
+            self.centros[j] = (self.centros[j] * self.cuentas[j] + self.centros[j + 1] * self.cuentas[j + 1]) / total
+            self.cuentas[j] = total
+            del self.centros[j + 1]
+            del self.cuentas[j + 1]
+
+    def transformar(self, valor):
+        if not self.n:
+            return 0.0
+        return sum(self.cuentas[:bisect.bisect_right(self.centros, valor)]) / self.n
+
+    def cota(self, maximo):
+        return 1.0
+
+NORMALIZADORES = {"ninguna": NormalizadorNulo, "zscore": NormalizadorZ, "rango": NormalizadorRango}
+
+# =========================================================
+# --- MOTOR DE PUNTUACIÓN ---
+# =========================================================
+class MotorPuntuacion:
+    """Combina las métricas de cada frame en una puntuación con pesos y normalización configurables."""
+    def __init__(self, pesos=None, normalizacion="ninguna", salida_temprana=False, max_hyperiqa=MAX_HYPERIQA):
+        if normalizacion not in NORMALIZADORES:
+            raise ValueError(f"Normalización desconocida: {normalizacion}")
+        self.pesos = dict(PESOS_POR_DEFECTO, **(pesos or {}))
+        self.normalizacion = normalizacion
+        self.salida_temprana = salida_temprana
+        self.max_hyperiqa = max_hyperiqa
+        # Con 'zscore' o 'rango' las estadísticas avanzan a lo largo del recorrido: la puntuación de un frame
+        # depende de los vistos antes y la salida temprana con normalización es heurística.
+        self.normalizadores = {nombre: NORMALIZADORES[normalizacion]() for nombre in self.pesos}
+        self.evaluaciones_evitadas = 0
+
+    def estado(self):
+        """Estadísticas de normalización acumuladas, serializables a JSON (para reanudar un recorrido)."""
+        # Copia de tamaño acotado (las listas de NormalizadorRango tienen como mucho max_bins elementos)
+        return {nombre: {clave: list(valor) if isinstance(valor, list) else valor
+                         for clave, valor in vars(normalizador).items()}
+                for nombre, normalizador in self.normalizadores.items()}
+
+    def restaurar(self, estado):
+        for nombre, valores in (estado or {}).items():
+            if nombre in self.normalizadores:
+                vars(self.normalizadores[nombre]).update(
+                    {clave: list(valor) if isinstance(valor, list) else valor for clave, valor in valores.items()})
+
+    def observar_candidatos(self, candidatos):
+        """Reenvía los candidatos (indice, frame, metricas) actualizando las estadísticas de las métricas baratas."""
+        for candidato in candidatos:
+            for nombre, valor in zip(METRICAS_BARATAS, candidato[2]):
+                self.normalizadores[nombre].observar(valor)
+            yield candidato
+
+    def parcial(self, metricas):
+        """Puntuación de las métricas OpenCV (nitidez, contraste, entropía) sin el término HyperIQA."""
+        return sum(self.pesos[nombre] * self.normalizadores[nombre].transformar(valor)
+                   for nombre, valor in zip(METRICAS_BARATAS, metricas))
+
+    def cota_hyperiqa(self):
+        """Máxima contribución posible del término HyperIQA con las estadísticas actuales."""
+        return self.pesos["hyperiqa"] * self.normalizadores["hyperiqa"].cota(self.max_hyperiqa)
+
+    def puntuar(self, metricas, hyperiqa):
+        return self.parcial(metricas) + self.pesos["hyperiqa"] * self.normalizadores["hyperiqa"].transformar(hyperiqa)
+
+    def elegir(self, candidatos, evaluar_hyperiqa, batch_size=16):
+        """Evalúa HyperIQA por lotes sobre los candidatos y devuelve el mejor (indice, frame, score), o None."""
+        mejor = None
+        candidatos = iter(candidatos)
+        while True:
+            lote = list(itertools.islice(candidatos, batch_size))
+            if not lote:
+                break
+            if self.salida_temprana and mejor is not None and self.pesos["hyperiqa"] >= 0:
+                cota = self.cota_hyperiqa()
+                restantes = [c for c in lote if self.parcial(c[2]) + cota > mejor[2]]
+                self.evaluaciones_evitadas += len(lote) - len(restantes)
+                lote = restantes
+                if not lote:
+                    continue
+            hyperiqa = evaluar_hyperiqa(lote)
+            for valor in hyperiqa:
+                self.normalizadores["hyperiqa"].observar(valor)
+            for (frame_idx, frame, metricas), hyper in zip(lote, hyperiqa):
+                score = self.puntuar(metricas, hyper)
+                if mejor is None or score > mejor[2]:
+                    mejor = (frame_idx, frame, score)
+        return mejor
@@ -0,0 +1,248 @@
+# spatial_index.py
+import os
+import json
+import math
+import time
+import numpy as np
+from track_store import BASE_DIR_COORDS, NOMBRE_TRACK, cargar_track
+from trayectoria import RADIO_TIERRA_M, distancias_a_punto
+from escritura_atomica import reemplazo_atomico, escribir_atomico
+
+# Junto al mapa: se borra con él y se reconstruye desde Coords/ e Img/
+RUTA_INDICE = "Mapa/indice_espacial"
+BASE_DIR_IMG = "Img"
+
+# Lado de la celda de la rejilla en grados (~55 m en latitud)
+CELDA_GRADOS = 0.0005
+
+# Un registro por punto del track; foto indica que Img/recorridoX/{segundo}.webp existe
+DTYPE_PUNTO = [("clave", np.int64), ("lat", np.float64), ("lon", np.float64),
+               ("recorrido", np.int32), ("segundo", np.int64), ("foto", np.bool_)]
+
+def firma_recorrido(recorrido, base_dir_coords=BASE_DIR_COORDS, base_dir_img=BASE_DIR_IMG):
+    """mtimes del track y de la carpeta de imágenes: si cambian, los puntos del recorrido se vuelven a indexar."""
+    firma = []
+    for ruta in (os.path.join(base_dir_coords, recorrido, NOMBRE_TRACK), os.path.join(base_dir_img, recorrido)):
+        try:
+            firma.append(os.stat(ruta).st_mtime_ns)
+        except OSError:
+            firma.append(None)
+    return firma
+
+def fotos_recorrido(recorrido, segundos, base_dir_img=BASE_DIR_IMG):
+    """Máscara (N,) de los segundos que tienen Img/recorridoX/{segundo}.webp (un listdir, sin un stat por segundo)."""
+    img_dir = os.path.join(base_dir_img, recorrido)
+    imagenes = set(os.listdir(img_dir)) if os.path.isdir(img_dir) else set()
+    return np.fromiter((f"{segundo}.webp" in imagenes for segundo in segundos), dtype=bool, count=len(segundos))
+
+# =========================================================
+# --- ÍNDICE EN REJILLA ---
+# =========================================================
+class IndiceEspacial:
+    """Índice en rejilla (tipo geohash) sobre todos los puntos GPS de todos los recorridos."""
+    def __init__(self, ruta=RUTA_INDICE, celda_grados=CELDA_GRADOS):
+        self.ruta = ruta
+        self.celda = celda_grados
+        self.columnas = int(math.ceil(360 / celda_grados)) + 1
+        self.recorridos = {}  # nombre -> {"id": int, "firma": [...]}
+        self.puntos = np.zeros(0, dtype=DTYPE_PUNTO)
+        self.claves = np.zeros(0, dtype=np.int64)
+        self._cargar()
+
+    def _cargar(self):
+        try:
+            with open(self.ruta + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+            puntos = np.load(self.ruta + ".npy")
+        except (OSError, ValueError):
+            return
+        # Con otro tamaño de celda las claves guardadas no sirven: se reindexa todo
+        if meta.get("celda") != self.celda:
+            return
+        self.recorridos = meta["recorridos"]
+        self._fijar(puntos)
+
+    def _fijar(self, puntos):
+        self.puntos = puntos
+        self.claves = np.ascontiguousarray(puntos["clave"])
+
+    def guardar(self):
+        with reemplazo_atomico(self.ruta + ".npy") as temporal:
+            np.save(temporal, self.puntos)
+        escribir_atomico(self.ruta + ".json", json.dumps({"celda": self.celda, "recorridos": self.recorridos}))
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def _filas_columnas(self, lat, lon):
+        fila = np.floor((np.asarray(lat) + 90) / self.celda).astype(np.int64)
+        columna = np.floor((np.asarray(lon) + 180) / self.celda).astype(np.int64)
+        return fila, columna
+
+    def nombre(self, recorrido_id):
+        return next(nombre for nombre, datos in self.recorridos.items() if datos["id"] == recorrido_id)
+
+    # --- Actualización incremental ---
+    def quitar(self, nombre):
+        datos = self.recorridos.pop(nombre, None)
+        if datos is not None:
+            self._fijar(self.puntos[self.puntos["recorrido"] != datos["id"]])
+
+    def _registros(self, nombre, coords, segundos, foto=None, firma=None):
+        """Puntos (sin ordenar) de un recorrido nuevo, registrándolo con el siguiente id libre."""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        n = min(len(coords), len(segundos))
+        nuevos = np.zeros(n, dtype=DTYPE_PUNTO)
+        nuevos["lat"], nuevos["lon"] = coords[:n, 0], coords[:n, 1]
+        fila, columna = self._filas_columnas(nuevos["lat"], nuevos["lon"])
+        nuevos["clave"] = fila * self.columnas + columna
+        nuevo_id = max((datos["id"] for datos in self.recorridos.values()), default=-1) + 1
+        nuevos["recorrido"] = nuevo_id
+        nuevos["segundo"] = np.asarray(segundos[:n], dtype=np.int64)
+        nuevos["foto"] = False if foto is None else np.asarray(foto[:n], dtype=bool)
+        self.recorridos[nombre] = {"id": nuevo_id, "firma": firma}
+        return nuevos
+
+    def construir(self, recorridos):
+        """Indexa de una vez {nombre: (coords, segundos, foto)} reemplazando todo el contenido (un solo ordenamiento)."""
+        self.recorridos = {}
+        bloques = [self._registros(nombre, *datos) for nombre, datos in recorridos.items()]
+        puntos = np.concatenate(bloques) if bloques else np.zeros(0, dtype=DTYPE_PUNTO)
+        self._fijar(puntos[np.argsort(puntos["clave"], kind="stable")])
+
+    def agregar(self, nombre, coords, segundos, foto=None, firma=None):
+        """Indexa (o reindexa) los puntos de un recorrido: coords (N, 2) [lat, lon], segundos (N,)."""
+        self.quitar(nombre)
+        nuevos = self._registros(nombre, coords, segundos, foto, firma)
+        nuevos = nuevos[np.argsort(nuevos["clave"], kind="stable")]
+        # Inserción ordenada: O(N) en memoria, sin reordenar los puntos ya indexados
+        posiciones = np.searchsorted(self.claves, nuevos["clave"], side="right")
+        self._fijar(np.insert(self.puntos, posiciones, nuevos))
+
+    def sincronizar(self, base_dir_coords=BASE_DIR_COORDS, base_dir_img=BASE_DIR_IMG):
+        """Reindexa los recorridos nuevos o modificados de Coords/ y quita los que ya no existen; devuelve cuántos cambiaron."""
+        existentes = set()
+        cambios = 0
+        if os.path.isdir(base_dir_coords):
+            for nombre in os.listdir(base_dir_coords):
+                if not os.path.isdir(os.path.join(base_dir_coords, nombre)):
+                    continue
+                track = cargar_track(nombre, base_dir_coords)
+                if track is None:
+                    continue
+                existentes.add(nombre)
+                firma = firma_recorrido(nombre, base_dir_coords, base_dir_img)
+                if self.recorridos.get(nombre, {}).get("firma") == firma:
+                    track.cerrar()
+                    continue
+                segundos = track.segundos
+                coords = track.coords
+                track.cerrar()
+                self.agregar(nombre, coords, segundos, fotos_recorrido(nombre, segundos, base_dir_img), firma)
+                cambios += 1
+        for nombre in set(self.recorridos) - existentes:
+            self.quitar(nombre)
+            cambios += 1
+        return cambios
+
+    # --- Consultas ---
+    def buscar_bbox(self, lat_min, lon_min, lat_max, lon_max, solo_fotos=False):
+        """Puntos dentro del rectángulo (array estructurado con DTYPE_PUNTO)."""
+        (f0, f1), (c0, c1) = self._filas_columnas([lat_min, lat_max], [lon_min, lon_max])
+        if not len(self.puntos) or f1 < f0 or c1 < c0:
+            return self.puntos[:0]
+        # Cada fila de celdas del bbox es un rango contiguo de claves
+        filas = np.arange(f0, f1 + 1, dtype=np.int64) * self.columnas
+        inicio = np.searchsorted(self.claves, filas + c0, side="left")
+        fin = np.searchsorted(self.claves, filas + c1, side="right")
+        largos = fin - inicio
+        desplazamientos = np.repeat(inicio - np.concatenate([[0], np.cumsum(largos)[:-1]]), largos)
+        candidatos = self.puntos[np.arange(largos.sum()) + desplazamientos]
+        dentro = ((candidatos["lat"] >= lat_min) & (candidatos["lat"] <= lat_max)
+                  & (candidatos["lon"] >= lon_min) & (candidatos["lon"] <= lon_max))
+        if solo_fotos:
+            dentro &= candidatos["foto"]
+        return candidatos[dentro]
+
+    def buscar_radio(self, lat, lon, metros, solo_fotos=False):
+        """Puntos a menos de `metros` de (lat, lon), ordenados por distancia: (puntos, distancias en metros)."""
+        dlat = math.degrees(metros / RADIO_TIERRA_M)
+        # El círculo es más ancho en longitud en su borde más cercano al polo
+        dlon = dlat / max(math.cos(math.radians(min(90.0, abs(lat) + dlat))), 1e-6)
+        candidatos = self.buscar_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon, solo_fotos)
+        distancias = distancias_a_punto(lat, lon, np.column_stack([candidatos["lat"], candidatos["lon"]]))
+        cerca = distancias <= metros
+        orden = np.argsort(distancias[cerca], kind="stable")
+        return candidatos[cerca][orden], distancias[cerca][orden]
+
+    def recorridos_cercanos(self, lat, lon, metros=50.0):
+        """{recorrido: [segundos con foto a menos de `metros`]} de los recorridos que pasan cerca del punto."""
+        puntos, _ = self.buscar_radio(lat, lon, metros)
+        resultado = {}
+        for recorrido_id in np.unique(puntos["recorrido"]):
+            del_recorrido = puntos[puntos["recorrido"] == recorrido_id]
+            resultado[self.nombre(int(recorrido_id))] = sorted(del_recorrido["segundo"][del_recorrido["foto"]].tolist())
+        return resultado
+
+def actualizar_indice_espacial(ruta=RUTA_INDICE, base_dir_coords=BASE_DIR_COORDS, base_dir_img=BASE_DIR_IMG):
+    """Sincroniza el índice guardado con Coords/ e Img/ y lo guarda si algo cambió."""
+    indice = IndiceEspacial(ruta)
+    if indice.sincronizar(base_dir_coords, base_dir_img):
+        indice.guardar()
+    return indice
+
+# =========================================================
+# --- MICRO-BENCHMARK ---
+# =========================================================
+def reporte_indice(n_puntos=1_000_000, puntos_por_recorrido=10_000, consultas=200, metros=50.0, semilla=0):
+    """Compara el índice con la búsqueda por fuerza bruta sobre recorridos sintéticos repartidos por una ciudad."""
+    import tempfile
+
+    rng = np.random.default_rng(semilla)
+    n_recorridos = max(1, n_puntos // puntos_por_recorrido)
+    centro = np.array([19.43, -99.13])
+
+    def recorrido_sintetico():
+        inicio = centro + rng.uniform(-0.09, 0.09, 2)
+        pasos = rng.normal(0, 0.00008, (puntos_por_recorrido, 2)) + rng.uniform(-0.00008, 0.00008, 2)
+        coords = inicio + np.cumsum(pasos, axis=0)
+        return coords, np.arange(puntos_por_recorrido), rng.random(puntos_por_recorrido) < 0.1
+
+    resultados = {"puntos": n_recorridos * puntos_por_recorrido, "recorridos": n_recorridos}
+    with tempfile.TemporaryDirectory() as carpeta:
+        indice = IndiceEspacial(os.path.join(carpeta, "indice"))
+        recorridos = [recorrido_sintetico() for _ in range(n_recorridos)]
+        inicio = time.perf_counter()
+        indice.construir({f"recorrido{i + 1}": datos for i, datos in enumerate(recorridos[:-1])})
+        resultados["construccion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+        inicio = time.perf_counter()
+        indice.agregar(f"recorrido{n_recorridos}", *recorridos[-1])
+        resultados["insercion_recorrido_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+        inicio = time.perf_counter()
+        indice.guardar()
+        indice = IndiceEspacial(indice.ruta)
+        resultados["guardar_y_cargar_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+        consultas_centros = centro + rng.uniform(-0.09, 0.09, (consultas, 2))
+        coords_todos = np.column_stack([indice.puntos["lat"], indice.puntos["lon"]])
+
+        inicio = time.perf_counter()
+        encontrados = [len(indice.buscar_radio(lat, lon, metros)[0]) for lat, lon in consultas_centros]
+        resultados["radio_ms"] = round((time.perf_counter() - inicio) * 1000 / consultas, 3)
+
+        inicio = time.perf_counter()
+        fuerza_bruta = [int((distancias_a_punto(lat, lon, coords_todos) <= metros).sum()) for lat, lon in consultas_centros]
+        resultados["radio_fuerza_bruta_ms"] = round((time.perf_counter() - inicio) * 1000 / consultas, 3)
+        resultados["coincide"] = encontrados == fuerza_bruta
+
+        inicio = time.perf_counter()
+        for lat, lon in consultas_centros:
+            indice.buscar_bbox(lat - 0.005, lon - 0.005, lat + 0.005, lon + 0.005)
+        resultados["bbox_1km_ms"] = round((time.perf_counter() - inicio) * 1000 / consultas, 3)
+    return resultados
+
+if __name__ == "__main__":
+    for clave, valor in reporte_indice().items():
+        print(f"{clave}: {valor}")
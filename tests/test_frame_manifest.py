@@ -0,0 +1,96 @@
+# tests/test_frame_manifest.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_manifest import ManifiestoExtraccion
+from batch_processor import buscar_recorridos_pendientes
+
+PARAMETROS = {"duracion_clip": 2, "top_k": None}
+
+
+def _recorrido(tmp_path, nombre="recorrido1"):
+    video_dir = tmp_path / "Vids" / nombre
+    video_dir.mkdir(parents=True)
+    video_path = video_dir / "video.webm"
+    video_path.write_bytes(b"video")
+    return str(video_path), str(tmp_path / "frameRep" / nombre)
+
+
+def _extraer(video_path, framerep_dest, ventanas=3, finalizar=True):
+    manifiesto = ManifiestoExtraccion(framerep_dest, video_path, PARAMETROS)
+    os.makedirs(framerep_dest, exist_ok=True)
+    for clip_idx in range(1, ventanas + 1):
+        with open(os.path.join(framerep_dest, f"{clip_idx}.webp"), "wb") as f:
+            f.write(b"webp")
+        manifiesto.registrar(clip_idx, clip_idx * 10, 0.5)
+    if finalizar:
+        manifiesto.finalizar()
+    else:
+        manifiesto.guardar(forzar=True)
+    return manifiesto
+
+
+def test_borrar_un_frame_revisado_no_deja_el_recorrido_pendiente(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    _extraer(video_path, framerep_dest)
+    os.remove(os.path.join(framerep_dest, "2.webp"))
+
+    assert buscar_recorridos_pendientes(str(tmp_path / "Vids"), str(tmp_path / "frameRep")) == []
+    manifiesto = ManifiestoExtraccion(framerep_dest, video_path, PARAMETROS)
+    assert manifiesto.completo and manifiesto.hecho(2)
+
+
+def test_corte_antes_de_finalizar_rehace_la_ventana_sin_webp(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    _extraer(video_path, framerep_dest, finalizar=False)
+    os.remove(os.path.join(framerep_dest, "3.webp"))
+
+    assert buscar_recorridos_pendientes(str(tmp_path / "Vids"), str(tmp_path / "frameRep")) == ["recorrido1"]
+    manifiesto = ManifiestoExtraccion(framerep_dest, video_path, PARAMETROS)
+    assert not manifiesto.completo
+    assert manifiesto.hecho(1) and not manifiesto.hecho(3)
+    assert manifiesto.primer_pendiente() == 3
+
+
+def test_reanudar_conserva_las_ventanas_y_reiniciar_las_descarta(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    _extraer(video_path, framerep_dest, finalizar=False)
+
+    assert ManifiestoExtraccion(framerep_dest, video_path, PARAMETROS).total_clips == 3
+    assert ManifiestoExtraccion(framerep_dest, video_path, PARAMETROS, reiniciar=True).total_clips == 0
+    assert ManifiestoExtraccion(framerep_dest, video_path, dict(PARAMETROS, duracion_clip=5)).total_clips == 0
+
+
+def test_video_cambiado_deja_el_recorrido_pendiente(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    _extraer(video_path, framerep_dest)
+    with open(video_path, "ab") as f:
+        f.write(b"mas")
+
+    assert buscar_recorridos_pendientes(str(tmp_path / "Vids"), str(tmp_path / "frameRep")) == ["recorrido1"]
+
+
+def test_parametros_nuevos_apartan_los_frames_del_manifiesto_anterior(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    _extraer(video_path, framerep_dest)
+    with open(os.path.join(framerep_dest, "revisado.webp"), "wb") as f:
+        f.write(b"webp")
+
+    ManifiestoExtraccion(framerep_dest, video_path, dict(PARAMETROS, duracion_clip=5))
+
+    restantes = sorted(n for n in os.listdir(framerep_dest) if n.endswith(".webp"))
+    assert restantes == ["revisado.webp"]
+    assert sorted(os.listdir(os.path.join(framerep_dest, ".anteriores"))) == ["1.webp", "2.webp", "3.webp"]
+
+
+def test_frames_escritos_ignora_webp_ajenos_y_ventanas_vacias(tmp_path):
+    video_path, framerep_dest = _recorrido(tmp_path)
+    manifiesto = _extraer(video_path, framerep_dest, finalizar=False)
+    manifiesto.registrar(4, None, None)
+    with open(os.path.join(framerep_dest, "99.webp"), "wb") as f:
+        f.write(b"webp")
+
+    assert manifiesto.total_clips == 4
+    assert manifiesto.frames_escritos == 3
@@ -0,0 +1,78 @@
+# tests/test_model_export.py
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+import model_export
+
+TOLERANCIA = 1e-3
+
+
+@pytest.fixture
+def hypernet():
+    """HyperNet con pesos aleatorios y estadísticas de BatchNorm no triviales, para que el plegado cuente."""
+    torch.manual_seed(0)
+    model_hyper = models.HyperNet(16, 112, 224, 112, 56, 28, 14, 7, pretrained_backbone=False)
+    for modulo in model_hyper.modules():
+        if isinstance(modulo, torch.nn.BatchNorm2d):
+            modulo.running_mean.uniform_(-0.5, 0.5)
+            modulo.running_var.uniform_(0.5, 1.5)
+            modulo.weight.data.uniform_(0.5, 1.5)
+            modulo.bias.data.uniform_(-0.5, 0.5)
+    return model_hyper.eval()
+
+
+@pytest.fixture
+def imgs():
+    return torch.randn(2, 3, 224, 224, generator=torch.Generator().manual_seed(1))
+
+
+def _lote(n):
+    return torch.randn(n, 3, 224, 224, generator=torch.Generator().manual_seed(n))
+
+
+def _scores(modelo, imgs):
+    with torch.inference_mode():
+        return modelo(imgs.contiguous(memory_format=torch.channels_last)).reshape(-1)
+
+
+def test_paridad_eager_plegado_torchscript(hypernet, imgs, tmp_path):
+    eager = _scores(models.HyperIQAScorer(hypernet).eval(), imgs)
+
+    plegado = model_export.construir_modelo_optimizado(hypernet, "cpu")
+    assert not any(isinstance(m, torch.nn.BatchNorm2d) for m in plegado.modules())
+    torch.testing.assert_close(_scores(plegado, imgs), eager, rtol=TOLERANCIA, atol=TOLERANCIA)
+
+    checkpoint = tmp_path / "modelo.pkl"
+    checkpoint.write_bytes(b"")
+    artefacto = str(tmp_path / "modelo.optimizado.pt")
+    trazado = model_export.trazar_y_guardar(plegado, artefacto, str(checkpoint), "cpu")
+    torch.testing.assert_close(_scores(trazado, imgs), eager, rtol=TOLERANCIA, atol=TOLERANCIA)
+
+    recargado = model_export.cargar_artefacto(artefacto, str(checkpoint), "cpu")
+    assert recargado is not None
+    torch.testing.assert_close(_scores(recargado, imgs), eager, rtol=TOLERANCIA, atol=TOLERANCIA)
+
+
+@pytest.mark.parametrize("tamano_lote", [1, 3])
+def test_artefacto_trazado_con_lote_2_sirve_para_otros_tamanos(hypernet, tamano_lote, tmp_path):
+    imgs = _lote(tamano_lote)
+    scorer = models.HyperIQAScorer(hypernet).eval()
+    eager = _scores(scorer, imgs)
+    assert eager.shape == (tamano_lote,)
+
+    checkpoint = tmp_path / "modelo.pkl"
+    checkpoint.write_bytes(b"")
+    artefacto = str(tmp_path / "modelo.optimizado.pt")
+    plegado = model_export.construir_modelo_optimizado(hypernet, "cpu")
+    trazado = model_export.trazar_y_guardar(plegado, artefacto, str(checkpoint), "cpu", tamano_lote=2)
+    recargado = model_export.cargar_artefacto(artefacto, str(checkpoint), "cpu")
+
+    torch.testing.assert_close(_scores(trazado, imgs), eager, rtol=TOLERANCIA, atol=TOLERANCIA)
+    torch.testing.assert_close(_scores(recargado, imgs), eager, rtol=TOLERANCIA, atol=TOLERANCIA)
@@ -0,0 +1,84 @@
+# tests/test_scoring.py
+import os
+import sys
+import math
+import random
+import bisect
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import MotorPuntuacion, NormalizadorZ, NormalizadorRango
+
+
+def test_pesos_por_defecto_reproducen_la_formula_original():
+    motor = MotorPuntuacion()
+    assert motor.puntuar((10.0, 20.0, 5.0), 50.0) == pytest.approx(0.3 * 10 + 0.2 * 20 + 0.2 * 5 + 0.3 * 50)
+
+
+def test_normalizacion_desconocida():
+    with pytest.raises(ValueError):
+        MotorPuntuacion(normalizacion="minmax")
+
+
+def test_zscore_con_media_y_desviacion_poblacional():
+    normalizador = NormalizadorZ()
+    assert normalizador.transformar(3.0) == 0.0
+    for valor in (1.0, 2.0, 3.0, 4.0):
+        normalizador.observar(valor)
+    assert normalizador.transformar(2.5) == pytest.approx(0.0)
+    assert normalizador.transformar(4.0) == pytest.approx(1.5 / math.sqrt(1.25))
+
+
+def test_rango_exacto_con_pocos_valores_distintos():
+    normalizador = NormalizadorRango(max_bins=16)
+    valores = [3.0, 1.0, 2.0, 2.0, 5.0]
+    for valor in valores:
+        normalizador.observar(valor)
+    ordenados = sorted(valores)
+    for valor in (0.0, 1.0, 2.0, 4.0, 5.0):
+        assert normalizador.transformar(valor) == bisect.bisect_right(ordenados, valor) / len(valores)
+
+
+def test_rango_con_memoria_acotada():
+    normalizador = NormalizadorRango(max_bins=32)
+    generador = random.Random(0)
+    for _ in range(5000):
+        normalizador.observar(generador.random())
+    assert len(normalizador.centros) <= 32
+    assert sum(normalizador.cuentas) == normalizador.n == 5000
+    assert normalizador.transformar(0.5) == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.parametrize("normalizacion", ["zscore", "rango"])
+def test_estado_y_restaurar(normalizacion):
+    motor = MotorPuntuacion(normalizacion=normalizacion)
+    candidatos = [(i, None, (float(i), float(i % 3), float(i % 5))) for i in range(20)]
+    list(motor.observar_candidatos(candidatos))
+    copia = MotorPuntuacion(normalizacion=normalizacion)
+    copia.restaurar(motor.estado())
+    assert copia.parcial((7.0, 1.0, 2.0)) == motor.parcial((7.0, 1.0, 2.0))
+    # El estado es una copia: seguir observando no cambia la restaurada
+    list(motor.observar_candidatos([(99, None, (1000.0, 0.0, 0.0))]))
+    assert copia.parcial((7.0, 1.0, 2.0)) != motor.parcial((7.0, 1.0, 2.0))
+
+
+def test_salida_temprana_elige_lo_mismo_evaluando_menos():
+    candidatos = [(0, None, (100.0, 0.0, 0.0)), (1, None, (0.0, 0.0, 0.0)), (2, None, (90.0, 0.0, 0.0))]
+    hyperiqa = {0: 50.0, 1: 100.0, 2: 60.0}
+    evaluados = []
+
+    def evaluar(lote):
+        evaluados.extend(c[0] for c in lote)
+        return [hyperiqa[c[0]] for c in lote]
+
+    exhaustivo = MotorPuntuacion().elegir(candidatos, evaluar, batch_size=1)
+    evaluados.clear()
+    motor = MotorPuntuacion(salida_temprana=True)
+    temprano = motor.elegir(candidatos, evaluar, batch_size=1)
+
+    assert temprano == exhaustivo
+    # 0*0.3 + 0.3*100 = 30 no supera 0.3*100 + 0.3*50 = 45: el candidato 1 no se evalúa
+    assert evaluados == [0, 2]
+    assert motor.evaluaciones_evitadas == 1
@@ -0,0 +1,65 @@
+# tests/test_spatial_index.py
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_index import IndiceEspacial
+from trayectoria import distancias_a_punto
+
+
+@pytest.fixture
+def indice(tmp_path):
+    rng = np.random.default_rng(0)
+    indice = IndiceEspacial(str(tmp_path / "indice"))
+    recorridos = {}
+    for n in range(1, 4):
+        coords = np.array([19.43, -99.13]) + rng.uniform(-0.01, 0.01, size=(500, 2))
+        segundos = np.arange(len(coords))
+        recorridos[f"recorrido{n}"] = (coords, segundos, segundos % 2 == 0)
+    indice.construir(recorridos)
+    return indice, recorridos
+
+
+def _todos(recorridos):
+    return np.concatenate([coords for coords, _, _ in recorridos.values()])
+
+
+def test_bbox_igual_a_fuerza_bruta(indice):
+    indice, recorridos = indice
+    coords = _todos(recorridos)
+    lat_min, lon_min, lat_max, lon_max = 19.425, -99.135, 19.432, -99.128
+    dentro = ((coords[:, 0] >= lat_min) & (coords[:, 0] <= lat_max)
+              & (coords[:, 1] >= lon_min) & (coords[:, 1] <= lon_max))
+    encontrados = indice.buscar_bbox(lat_min, lon_min, lat_max, lon_max)
+    assert len(encontrados) == int(dentro.sum())
+    assert sorted(map(tuple, np.column_stack([encontrados["lat"], encontrados["lon"]]))) == \
+        sorted(map(tuple, coords[dentro]))
+
+
+def test_radio_igual_a_fuerza_bruta_y_ordenado(indice):
+    indice, recorridos = indice
+    coords = _todos(recorridos)
+    puntos, distancias = indice.buscar_radio(19.43, -99.13, 300.0)
+    assert len(puntos) == int((distancias_a_punto(19.43, -99.13, coords) <= 300.0).sum())
+    assert np.all(np.diff(distancias) >= 0)
+    assert np.all(distancias <= 300.0)
+
+
+def test_agregar_quitar_y_guardar(indice, tmp_path):
+    indice, recorridos = indice
+    total = len(indice)
+    indice.agregar("recorrido9", [[19.43, -99.13]], [7], foto=[True])
+    assert len(indice) == total + 1
+    assert indice.recorridos_cercanos(19.43, -99.13, 1.0)["recorrido9"] == [7]
+
+    indice.guardar()
+    cargado = IndiceEspacial(indice.ruta)
+    assert len(cargado) == total + 1
+    cargado.quitar("recorrido9")
+    assert len(cargado) == total
+    assert "recorrido9" not in cargado.recorridos_cercanos(19.43, -99.13, 1.0)
@@ -0,0 +1,53 @@
+# tests/test_trayectoria.py
+import os
+import sys
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trayectoria import (RADIO_TIERRA_M, distancia_haversine, distancias_haversine, distancias_elipsoidales,
+                         distancias_a_punto, velocidad_media)
+
+
+def _grados(g, m, s):
+    signo = -1 if g < 0 else 1
+    return signo * (abs(g) + m / 60 + s / 3600)
+
+# Ejemplo de referencia de Vincenty (1975): Flinders Peak -> Buckland Park
+FLINDERS_PEAK = (_grados(-37, 57, 3.72030), _grados(144, 25, 29.52440))
+BUCKLAND_PARK = (_grados(-37, 39, 10.15610), _grados(143, 55, 35.38390))
+
+
+def test_vincenty_flinders_peak_buckland_park():
+    distancias = distancias_elipsoidales(np.array([FLINDERS_PEAK, BUCKLAND_PARK]))
+    assert distancias[0] == pytest.approx(54972.271, abs=1e-3)
+
+
+def test_vincenty_un_grado_de_meridiano_en_el_ecuador():
+    distancias = distancias_elipsoidales(np.array([[0.0, 0.0], [1.0, 0.0]]))
+    assert distancias[0] == pytest.approx(110574.389, abs=1e-2)
+
+
+def test_haversine_un_grado_sobre_la_esfera():
+    esperado = RADIO_TIERRA_M * math.pi / 180
+    distancias = distancias_haversine(np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]]))
+    assert distancias[0] == pytest.approx(esperado)
+    assert distancias[1] == pytest.approx(esperado * math.cos(math.radians(1.0)), rel=1e-4)
+    assert distancia_haversine(0.0, 0.0, 1.0, 0.0) == pytest.approx(esperado)
+
+
+def test_distancias_a_punto_coinciden_con_haversine():
+    coords = np.array([[19.43, -99.13], [19.44, -99.12], [19.40, -99.20]])
+    esperado = [distancia_haversine(19.43, -99.13, lat, lon) for lat, lon in coords]
+    assert distancias_a_punto(19.43, -99.13, coords) == pytest.approx(esperado)
+
+
+def test_velocidad_media_ignora_tramos_sin_avance_de_tiempo():
+    coords = np.array([[0.0, 0.0], [0.0, 0.001], [0.0, 0.002]])
+    # El segundo tramo no avanza en el tiempo: solo cuenta el primero
+    km_h = velocidad_media(coords, [0, 10, 10], modo="haversine")
+    assert km_h == pytest.approx(distancias_haversine(coords)[0] / 1000 / (10 / 3600))
@@ -0,0 +1,122 @@
+# track_store.py
+import io
+import os
+import json
+import numpy as np
+from escritura_atomica import reemplazo_atomico
+
+BASE_DIR_COORDS = "Coords"
+NOMBRE_TXT = "cordenadas.txt"
+NOMBRE_JSON = "cordenadas.json"
+NOMBRE_TRACK = "cordenadas.npz"
+
+# Una línea del registro GPS: "Segundo N: lat=..., lon=..."
+PATRON_LINEA = r"Segundo\s*(-?\d+)\s*:\s*lat\s*=\s*([-+0-9.eE]+)\s*,\s*lon\s*=\s*([-+0-9.eE]+)"
+DTYPE_LINEA = [("segundo", np.int64), ("lat", np.float64), ("lon", np.float64)]
+
+# =========================================================
+# --- LECTURA DE LOS FORMATOS DE TEXTO ---
+# =========================================================
+def parsear_txt(txt_path):
+    """Lee cordenadas.txt de una sola pasada y devuelve (segundos (N,), coords (N, 2))."""
+    with open(txt_path, "r", encoding="utf-8", errors="replace") as f:
+        filas = np.fromregex(io.StringIO(f.read()), PATRON_LINEA, DTYPE_LINEA)
+    return filas["segundo"], np.column_stack([filas["lat"], filas["lon"]])
+
+def parsear_json(json_path):
+    """Lee el cordenadas.json histórico {"grupos": [[[lat, lon], ...]], "segundos": [...]}."""
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    grupos = data.get("grupos", [])
+    coords = np.asarray(grupos[0] if grupos else [], dtype=np.float64).reshape(-1, 2)
+    return np.asarray(data.get("segundos", []), dtype=np.int64), coords
+
+# =========================================================
+# --- ALMACÉN COLUMNAR POR RECORRIDO ---
+# =========================================================
+def guardar_track(track_path, segundos, coords):
+    """Escribe el .npz sin comprimir (segundos int64, lat y lon float64) de forma atómica."""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    with reemplazo_atomico(track_path) as temporal:
+        np.savez(temporal, segundos=np.asarray(segundos, dtype=np.int64), lat=coords[:, 0], lon=coords[:, 1])
+
+class Track:
+    """Track GPS de un recorrido guardado en cordenadas.npz; cada columna se lee del disco al usarla por primera vez."""
+    def __init__(self, track_path):
+        self.ruta = track_path
+        self._npz = None
+        self._columnas = {}
+
+    def _columna(self, nombre):
+        if nombre not in self._columnas:
+            if self._npz is None:
+                self._npz = np.load(self.ruta)
+            self._columnas[nombre] = self._npz[nombre]
+        return self._columnas[nombre]
+
+    @property
+    def segundos(self):
+        return self._columna("segundos")
+
+    @property
+    def coords(self):
+        """Array (N, 2) [lat, lon]."""
+        return np.column_stack([self._columna("lat"), self._columna("lon")])
+
+    def __len__(self):
+        return len(self.segundos)
+
+    def cerrar(self):
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+
+def _desactualizado(track_path, fuente):
+    return not os.path.exists(track_path) or os.path.getmtime(fuente) > os.path.getmtime(track_path)
+
+def asegurar_track(recorrido, base_dir_coords=BASE_DIR_COORDS):
+    """Crea o actualiza Coords/recorridoX/cordenadas.npz desde el .txt (o el .json histórico); devuelve su ruta o None."""
+    coords_dir = os.path.join(base_dir_coords, recorrido)
+    track_path = os.path.join(coords_dir, NOMBRE_TRACK)
+    for nombre, parsear in ((NOMBRE_TXT, parsear_txt), (NOMBRE_JSON, parsear_json)):
+        fuente = os.path.join(coords_dir, nombre)
+        if os.path.exists(fuente):
+            if _desactualizado(track_path, fuente):
+                guardar_track(track_path, *parsear(fuente))
+            return track_path
+    return track_path if os.path.exists(track_path) else None
+
+def cargar_track(recorrido, base_dir_coords=BASE_DIR_COORDS):
+    """Track (perezoso) del recorrido, convirtiendo sus coordenadas si hace falta; None si no tiene."""
+    track_path = asegurar_track(recorrido, base_dir_coords)
+    return Track(track_path) if track_path else None
+
+def cargar_tracks(base_dir_coords=BASE_DIR_COORDS):
+    """{recorrido: Track} de todas las subcarpetas de Coords/ con coordenadas."""
+    tracks = {}
+    if not os.path.isdir(base_dir_coords):
+        return tracks
+    for recorrido in os.listdir(base_dir_coords):
+        if os.path.isdir(os.path.join(base_dir_coords, recorrido)):
+            track = cargar_track(recorrido, base_dir_coords)
+            if track is not None:
+                tracks[recorrido] = track
+    return tracks
+
+# =========================================================
+# --- CONVERSIÓN DE Coords/ EXISTENTES ---
+# =========================================================
+def convertir_coords(base_dir_coords=BASE_DIR_COORDS, borrar_json=False):
+    """Genera cordenadas.npz en cada recorrido de Coords/ y devuelve {recorrido: puntos}."""
+    resultado = {}
+    for recorrido, track in cargar_tracks(base_dir_coords).items():
+        resultado[recorrido] = len(track)
+        track.cerrar()
+        json_path = os.path.join(base_dir_coords, recorrido, NOMBRE_JSON)
+        if borrar_json and os.path.exists(json_path):
+            os.remove(json_path)
+    return resultado
+
+if __name__ == "__main__":
+    for recorrido, puntos in convertir_coords().items():
+        print(f"✅ {recorrido}: {puntos} puntos")
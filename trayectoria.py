@@ -0,0 +1,219 @@
+# trayectoria.py
+import math
+import time
+import bisect
+import numpy as np
+
+# Radio medio de la Tierra (IUGG) en metros
+RADIO_TIERRA_M = 6371008.8
+
+# Elipsoide WGS84 (el mismo que usa geopy.distance.geodesic por defecto)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Por debajo de esta velocidad (m/s, ~1.8 km/h) el vehículo se considera detenido
+VELOCIDAD_MINIMA = 0.5
+
+# =========================================================
+# --- DISTANCIAS SOBRE EL TRACK GPS ---
+# =========================================================
+def distancia_haversine(lat1, lon1, lat2, lon2):
+    """Distancia en metros entre dos coordenadas (esfera de radio medio; error < 0.5% frente a geodesic)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+def distancias_haversine(coords):
+    """Distancias en metros entre coordenadas consecutivas de un array (N, 2) [lat, lon] en grados: array (N-1,)."""
+    rad = np.radians(np.asarray(coords, dtype=np.float64))
+    lat, lon = rad[:, 0], rad[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distancias_elipsoidales(coords, tolerancia=1e-12, max_iteraciones=200):
+    """Distancias en metros sobre el elipsoide WGS84 (Vincenty inversa) entre coordenadas consecutivas."""
+    rad = np.radians(np.asarray(coords, dtype=np.float64))
+    lat1, lat2 = rad[:-1, 0], rad[1:, 0]
+    L = np.diff(rad[:, 1])
+    U1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    convergido = np.zeros(L.shape, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(max_iteraciones):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Sobre el ecuador cos2_alpha = 0 y el término desaparece
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_anterior = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            convergido = np.abs(lam - lam_anterior) < tolerancia
+            if convergido.all():
+                break
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    distancias = WGS84_B * A * (sigma - delta_sigma)
+    return np.where(convergido, distancias, distancias_haversine(coords))
+
+def distancias_a_punto(lat, lon, coords):
+    """Distancias haversine en metros desde (lat, lon) a cada coordenada de un array (N, 2): array (N,)."""
+    rad = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    p1, l1 = math.radians(lat), math.radians(lon)
+    a = np.sin((rad[:, 0] - p1) / 2) ** 2 + math.cos(p1) * np.cos(rad[:, 0]) * np.sin((rad[:, 1] - l1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+MODOS_DISTANCIA = {"haversine": distancias_haversine, "elipsoidal": distancias_elipsoidales}
+
+def distancias_por_tramo(coords, modo="elipsoidal"):
+    if modo not in MODOS_DISTANCIA:
+        raise ValueError(f"Modo de distancia desconocido: {modo}")
+    if len(coords) < 2:
+        return np.zeros(0)
+    return MODOS_DISTANCIA[modo](coords)
+
+def _tramos(coords, segundos, modo):
+    """(distancia en km, tiempo en h) de cada tramo, sobre las coordenadas que tienen segundo."""
+    n = min(len(coords), len(segundos))
+    dist_km = distancias_por_tramo(np.asarray(coords, dtype=np.float64)[:n], modo) / 1000
+    tiempo_h = np.diff(np.asarray(segundos[:n], dtype=np.float64)) / 3600
+    return dist_km, tiempo_h
+
+def velocidad_media(coords, segundos, modo="elipsoidal"):
+    """Velocidad media en km/h del recorrido: distancia total / tiempo total de los tramos en que el tiempo avanza."""
+    dist_km, tiempo_h = _tramos(coords, segundos, modo)
+    validos = tiempo_h > 0
+    total_h = tiempo_h[validos].sum()
+    return float(dist_km[validos].sum() / total_h) if total_h > 0 else 0.0
+
+# =========================================================
+# --- VENTANAS DE SELECCIÓN (EN SEGUNDOS DE VIDEO) ---
+# =========================================================
+# Una ventana es (segundo, [(t0, t1), ...]): el frame elegido entre los tramos [t0, t1) se guarda
+# como {segundo}.webp, el nombre con el que el mapa lo asocia a la coordenada de ese segundo.
+
+def ventanas_por_segundo(segundos, duracion_ventana=1.0):
+    """Una ventana de duracion_ventana segundos centrada en cada segundo con coordenada."""
+    mitad = duracion_ventana / 2
+    return [(segundo, [(max(0.0, segundo - mitad), segundo + mitad)]) for segundo in sorted(set(segundos))]
+
+def ventanas_por_distancia(puntos, segundos, metros=10.0, velocidad_minima=VELOCIDAD_MINIMA):
+    """Una ventana por cada `metros` recorridos a lo largo del track, sin los tramos en que el vehículo está detenido."""
+    orden = sorted(range(len(segundos)), key=lambda i: segundos[i])
+    segundos_ordenados = [segundos[i] for i in orden]
+    tramos = {}   # indice de ventana -> [(t0, t1)]
+    centros = {}  # indice de ventana -> tiempo en el que se alcanza su distancia media
+    recorrido = 0.0
+    for a, b in zip(orden, orden[1:]):
+        t0, t1 = segundos[a], segundos[b]
+        if t1 <= t0:
+            continue
+        dist = distancia_haversine(puntos[a][0], puntos[a][1], puntos[b][0], puntos[b][1])
+        if dist / (t1 - t0) < velocidad_minima:
+            continue
+        d0, d1 = recorrido, recorrido + dist
+        for k in range(int(d0 // metros), int(math.ceil(d1 / metros))):
+            x0, x1 = max(d0, k * metros), min(d1, (k + 1) * metros)
+            if x1 <= x0:
+                continue
+            tramos.setdefault(k, []).append((t0 + (x0 - d0) / dist * (t1 - t0), t0 + (x1 - d0) / dist * (t1 - t0)))
+            medio = (k + 0.5) * metros
+            if d0 <= medio < d1:
+                centros[k] = t0 + (medio - d0) / dist * (t1 - t0)
+        recorrido = d1
+
+    ventanas = {}
+    for k, intervalos in tramos.items():
+        centro = centros.get(k, (intervalos[0][0] + intervalos[-1][1]) / 2)
+        ventanas.setdefault(_segundo_mas_cercano(segundos_ordenados, centro), []).extend(intervalos)
+    return sorted(((segundo, _unir(intervalos)) for segundo, intervalos in ventanas.items()),
+                  key=lambda v: v[1][0][0])
+
+def _segundo_mas_cercano(segundos_ordenados, t):
+    i = bisect.bisect_left(segundos_ordenados, t)
+    vecinos = segundos_ordenados[max(0, i - 1):i + 1]
+    return min(vecinos, key=lambda s: abs(s - t))
+
+def _unir(intervalos):
+    """Ordena y une los intervalos contiguos o solapados (con tolerancia al redondeo de la interpolación)."""
+    unidos = []
+    for t0, t1 in sorted(intervalos):
+        if unidos and t0 <= unidos[-1][1] + 1e-6:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], t1))
+        else:
+            unidos.append((t0, t1))
+    return unidos
+
+# =========================================================
+# --- MICRO-BENCHMARK ---
+# =========================================================
+def track_sintetico(n_puntos=20000, semilla=0):
+    """Track GPS de prueba: una lectura por segundo a 0-60 km/h con rumbo variable y algunos segundos repetidos."""
+    rng = np.random.default_rng(semilla)
+    velocidad = rng.uniform(0, 60 / 3.6, n_puntos - 1)
+    rumbo = np.cumsum(rng.normal(0, 0.2, n_puntos - 1))
+    paso_lat = velocidad * np.cos(rumbo) / 111_320
+    paso_lon = velocidad * np.sin(rumbo) / (111_320 * np.cos(np.radians(19.43)))
+    coords = np.column_stack([19.43 + np.concatenate([[0], np.cumsum(paso_lat)]),
+                              -99.13 + np.concatenate([[0], np.cumsum(paso_lon)])])
+    segundos = np.concatenate([[0], np.cumsum(rng.random(n_puntos - 1) > 0.02)])
+    return coords, segundos.tolist()
+
+def _velocidad_media_geopy(coords, segundos):
+    """Referencia: el bucle por pares con geopy.distance.geodesic que usaba Map_generator."""
+    from geopy.distance import geodesic
+
+    total_dist = 0
+    total_tiempo_h = 0
+    for j in range(len(coords) - 1):
+        tiempo_h = (segundos[j + 1] - segundos[j]) / 3600
+        dist_km = geodesic(tuple(coords[j]), tuple(coords[j + 1])).km
+        if tiempo_h > 0:
+            total_dist += dist_km
+            total_tiempo_h += tiempo_h
+    return total_dist / total_tiempo_h if total_tiempo_h > 0 else 0
+
+def reporte_velocidades(n_puntos=20000):
+    """Compara el bucle geopy con los modos vectorizados: tiempo, aceleración y diferencia en km/h."""
+    coords, segundos = track_sintetico(n_puntos)
+    medidas = {}
+    try:
+        inicio = time.perf_counter()
+        referencia = _velocidad_media_geopy(coords, segundos)
+        medidas["geopy"] = (time.perf_counter() - inicio, referencia)
+    except ImportError:
+        referencia = None
+    for modo in MODOS_DISTANCIA:
+        inicio = time.perf_counter()
+        valor = velocidad_media(coords, segundos, modo)
+        medidas[modo] = (time.perf_counter() - inicio, valor)
+
+    base = medidas.get("geopy", (None,))[0]
+    resultados = {}
+    for nombre, (segundos_cpu, valor) in medidas.items():
+        resultados[nombre] = {
+            "ms": round(segundos_cpu * 1000, 2),
+            "km/h": round(valor, 4),
+            "aceleracion": round(base / segundos_cpu, 1) if base and segundos_cpu > 0 else None,
+            "diferencia_km/h": None if referencia is None else abs(valor - referencia),
+        }
+    return resultados
+
+if __name__ == "__main__":
+    for nombre, medida in reporte_velocidades().items():
+        print(f"{nombre}: {medida}")
@@ -0,0 +1,194 @@
+# video_backends.py
+import os
+import time
+import cv2
+
+BACKENDS = ("opencv", "opencv-hilos", "pyav")
+
+# =========================================================
+# --- CAPTURAS CON LA INTERFAZ DE cv2.VideoCapture ---
+# =========================================================
+def _dimensiones_reducidas(ancho, alto, ancho_max):
+    """(ancho, alto) escalados a ancho_max conservando la proporción (par, como exige swscale para yuv420)."""
+    if not ancho_max or ancho <= ancho_max:
+        return ancho, alto
+    return ancho_max, max(2, int(round(alto * ancho_max / ancho / 2)) * 2)
+
+class CapturaEscalada:
+    """Envuelve una cv2.VideoCapture y entrega los frames reducidos a ancho_max (cv2.resize con INTER_AREA)."""
+    def __init__(self, cap, ancho_max):
+        self.cap = cap
+        self.ancho_max = ancho_max
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            return ret, frame
+        h, w = frame.shape[:2]
+        destino = _dimensiones_reducidas(w, h, self.ancho_max)
+        if destino != (w, h):
+            frame = cv2.resize(frame, destino, interpolation=cv2.INTER_AREA)
+        return ret, frame
+
+    def __getattr__(self, nombre):
+        # grab, set, get, release, isOpened... se delegan en la captura original
+        return getattr(self.cap, nombre)
+
+class CapturaPyAV:
+    """Decodificación con PyAV (libavcodec con hilos) con la interfaz de cv2.VideoCapture."""
+    def __init__(self, video_path, hilos=None, ancho_max=None):
+        import av
+
+        self.contenedor = av.open(video_path)
+        self.stream = self.contenedor.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        if hilos:
+            self.stream.codec_context.thread_count = hilos
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 0)
+        self.inicio_pts = self.stream.start_time or 0
+        self.ancho_max = ancho_max
+        self.posicion = 0
+        self.pendiente = None
+        self.frames = self.contenedor.decode(self.stream)
+
+    def isOpened(self):
+        return self.contenedor is not None
+
+    def _siguiente(self):
+        if self.pendiente is not None:
+            frame, self.pendiente = self.pendiente, None
+            return frame
+        return next(self.frames, None)
+
+    def _indice(self, frame):
+        return int(round(float((frame.pts - self.inicio_pts) * self.stream.time_base) * self.fps))
+
+    def grab(self):
+        if self._siguiente() is None:
+            return False
+        self.posicion += 1
+        return True
+
+    def read(self):
+        frame = self._siguiente()
+        if frame is None:
+            return False, None
+        self.posicion += 1
+        ancho, alto = _dimensiones_reducidas(frame.width, frame.height, self.ancho_max)
+        return True, frame.to_ndarray(format="bgr24", width=ancho, height=alto)
+
+    def set(self, propiedad, valor):
+        if propiedad != cv2.CAP_PROP_POS_FRAMES or not self.fps:
+            return False
+        objetivo = int(valor)
+        # Salta al keyframe anterior y descarta hasta el frame pedido
+        self.contenedor.seek(self.inicio_pts + int(objetivo / self.fps / self.stream.time_base),
+                             stream=self.stream, backward=True)
+        self.frames = self.contenedor.decode(self.stream)
+        self.pendiente = None
+        for frame in self.frames:
+            if frame.pts is not None and self._indice(frame) >= objetivo:
+                self.pendiente = frame
+                self.posicion = self._indice(frame)
+                return True
+        return False
+
+    def get(self, propiedad):
+        if propiedad == cv2.CAP_PROP_FPS:
+            return self.fps
+        if propiedad == cv2.CAP_PROP_POS_FRAMES:
+            return self.posicion
+        if propiedad == cv2.CAP_PROP_FRAME_COUNT:
+            if self.stream.frames:
+                return self.stream.frames
+            if self.contenedor.duration:
+                return int(self.contenedor.duration / 1_000_000 * self.fps)
+            return 0
+        return 0
+
+    def release(self):
+        if self.contenedor is not None:
+            self.contenedor.close()
+            self.contenedor = None
+
+# =========================================================
+# --- SELECCIÓN DE BACKEND ---
+# =========================================================
+class Decodificador:
+    """Configuración de decodificación: backend ('opencv', 'opencv-hilos' o 'pyav'), hilos y ancho máximo de los frames."""
+    def __init__(self, backend="opencv", hilos=None, ancho_max=None, aceleracion=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de decodificación desconocido: {backend}")
+        self.backend = backend
+        self.hilos = hilos
+        self.ancho_max = ancho_max
+        self.aceleracion = aceleracion
+
+    @property
+    def reducido(self):
+        return bool(self.ancho_max)
+
+    def completo(self):
+        """El mismo decodificador sin reducción de resolución."""
+        return Decodificador(self.backend, self.hilos, None, self.aceleracion)
+
+    def abrir(self, video_path):
+        """Devuelve una captura con la interfaz de cv2.VideoCapture."""
+        if self.backend == "pyav":
+            return CapturaPyAV(video_path, hilos=self.hilos, ancho_max=self.ancho_max)
+        if self.backend == "opencv-hilos":
+            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, self._parametros_opencv())
+        else:
+            cap = cv2.VideoCapture(video_path)
+        return CapturaEscalada(cap, self.ancho_max) if self.ancho_max else cap
+
+    def _parametros_opencv(self):
+        parametros = []
+        if hasattr(cv2, "CAP_PROP_N_THREADS"):
+            parametros += [cv2.CAP_PROP_N_THREADS, self.hilos or os.cpu_count() or 1]
+        if self.aceleracion:
+            parametros += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        return parametros
+
+    def __repr__(self):
+        reduccion = f", ancho {self.ancho_max}" if self.ancho_max else ""
+        return f"{self.backend} ({self.hilos or 'auto'} hilos{reduccion})"
+
+# =========================================================
+# --- MICRO-BENCHMARK ---
+# =========================================================
+def medir_decodificacion(video_path, decodificador, max_frames=600):
+    """Frames por segundo decodificados (hasta BGR) por un decodificador sobre los primeros max_frames."""
+    cap = decodificador.abrir(video_path)
+    if not cap.isOpened():
+        raise Exception(f"No se pudo abrir el video: {video_path}")
+    frames = 0
+    inicio = time.perf_counter()
+    try:
+        while frames < max_frames:
+            ret, _ = cap.read()
+            if not ret:
+                break
+            frames += 1
+    finally:
+        cap.release()
+    segundos = time.perf_counter() - inicio
+    return frames / segundos if segundos > 0 else 0.0
+
+def reporte_decodificacion(video_path, max_frames=600, hilos=None, ancho_max=512):
+    """Compara los backends disponibles, a resolución completa y reducida; devuelve {nombre: frames/s}."""
+    resultados = {}
+    for backend in BACKENDS:
+        for ancho in (None, ancho_max):
+            decodificador = Decodificador(backend, hilos=hilos, ancho_max=ancho)
+            try:
+                resultados[repr(decodificador)] = round(medir_decodificacion(video_path, decodificador, max_frames), 1)
+            except ImportError:
+                resultados[repr(decodificador)] = "no instalado"
+    return resultados
+
+if __name__ == "__main__":
+    from recorridos import ultimo_recorrido
+    video = os.path.join("Vids", ultimo_recorrido(), "video.webm")
+    for nombre, fps in reporte_decodificacion(video).items():
+        print(f"{nombre}: {fps} frames/s")